@@ -1,33 +1,61 @@
 from flask import Flask
 from controllers.config import config_app
-from models.models import db, User
+from models.models import db
+from models.migrations import bootstrap
 from controllers.routes import init_routes
-from werkzeug.security import generate_password_hash
+from controllers.api import init_api
+from controllers.commands import init_commands
+from controllers.cache import init_cache
+from controllers.metrics import init_metrics
+from controllers.passwords import init_passwords
+from controllers.eventlog import init_event_log
+from controllers.archive import init_archive
 import os
 
-app = Flask(__name__)
+def create_app(config=None):
+    """Build the Flask application. Nothing here touches the database unless AUTO_BOOTSTRAP is set,
+    so worker start up stays cheap; create the schema & admin user once with `flask init-db`."""
+    app = Flask(__name__)
 
-# Configure the Flask application
-config_app(app)
+    # Configure the Flask application (environment variables, then the given overrides)
+    config_app(app, config)
 
-# Initialize the database
-db.init_app(app)
+    # Initialize the database
+    db.init_app(app)
 
-# Create the database tables if they do not exist
-with app.app_context():
-    db.create_all()
-    # Create admin user if it doesn't exist
-    admin_user = User.query.filter_by(isadmin=True).first()
-    if not admin_user:
-        password = 'admin'
-        passhash = generate_password_hash(password)
-        admin_user = User(username='admin', passhash=passhash, name='Admin', city='Delhi', pincode=110043, isadmin=True)
-        db.session.add(admin_user)
-        db.session.commit()
+    # Pick the lot cache backend
+    init_cache(app)
 
-# Import routes
-init_routes(app)
+    # Create missing tables, apply migrations & seed the admin user (opt-in)
+    if app.config.get('AUTO_BOOTSTRAP'):
+        with app.app_context():
+            bootstrap()
+
+    # Time requests & count SQL statements (Server-Timing header, /metrics)
+    init_metrics(app)
+
+    # Password hashing pool & failed login throttle
+    init_passwords(app)
+
+    # Reservation event log writer (group commits)
+    init_event_log(app)
+
+    # Background archival of old released bookings (opt-in)
+    init_archive(app)
+
+    # Import routes
+    init_routes(app)
+
+    # JSON API for gate devices (/api/v1)
+    init_api(app)
+
+    # Register CLI commands
+    init_commands(app)
+
+    return app
 
 if __name__ == '__main__':
+    # The development server bootstraps the database itself, use wsgi.py behind gunicorn in production
+    app = create_app({'AUTO_BOOTSTRAP': True})
     port = int(os.environ.get("PORT", 10000))  # 10000 is a fallback
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG', 'False').lower() in ('1', 'true'))
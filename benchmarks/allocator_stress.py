@@ -0,0 +1,116 @@
+"""Multi-threaded stress benchmark for the spot allocator.
+
+Many threads book spots of the same lot at once, every booking claims a spot through
+allocator.claim() and commits a reservation. At the end no spot may be held by two
+open reservations.
+
+    python benchmarks/allocator_stress.py --spots 500 --threads 32 --bookings 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveParkingLot
+from controllers.allocator import allocator
+
+
+def make_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30, 'check_same_thread': False}}
+    db.init_app(app)
+    return app
+
+
+def seed(app, spots, users):
+    with app.app_context():
+        db.create_all()
+        lot = ParkingLot(parking_name='Stress', address='Gate 1', city='Delhi', pincode='110001', price=20.0, number_of_spots=spots)
+        db.session.add(lot)
+        db.session.flush()
+        db.session.add_all([ParkingSpot(lot_id=lot.id, spot_number='P{:03d}'.format(i + 1)) for i in range(spots)])
+        db.session.add_all([User(username=f'user{i}', passhash='-', name=f'User {i}', city='Delhi', pincode='110001') for i in range(users)])
+        db.session.commit()
+        return lot.id
+
+
+results_lock = threading.Lock()
+
+
+def count(results, key):
+    with results_lock:
+        results[key] += 1
+
+
+def worker(app, lot_id, jobs, results):
+    with app.app_context():
+        while True:
+            try:
+                user_id, vehicle = jobs.pop()
+            except IndexError:
+                return
+            claimed = None
+            try:
+                # Everybody asks for the same spot to force conflicts
+                claimed = allocator.claim(lot_id, 'P001')
+                if not claimed:
+                    count(results, 'full')
+                    continue
+                db.session.add(ReserveParkingLot(user_id=user_id, spot_id=claimed[0], in_time=datetime.now(), vehicle_number=vehicle))
+                db.session.commit()
+                count(results, 'booked')
+            except Exception:
+                db.session.rollback()
+                if claimed:
+                    allocator.release(lot_id, *claimed)
+                count(results, 'errors')
+            finally:
+                db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spots', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--bookings', type=int, default=1000)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    app = make_app(db_path)
+    lot_id = seed(app, args.spots, args.bookings)
+    jobs = [(i + 1, f'DL{i:06d}') for i in range(args.bookings)]
+    results = {'booked': 0, 'full': 0, 'errors': 0}
+
+    threads = [threading.Thread(target=worker, args=(app, lot_id, jobs, results)) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        double_booked = db.session.query(ReserveParkingLot.spot_id)\
+            .filter(ReserveParkingLot.is_release == False)\
+            .group_by(ReserveParkingLot.spot_id)\
+            .having(func.count(ReserveParkingLot.id) > 1).count()
+        occupied = ParkingSpot.query.filter_by(lot_id=lot_id, occupied=True).count()
+
+    print(f"bookings attempted : {args.bookings} on {args.spots} spots with {args.threads} threads")
+    print(f"booked / full / err: {results['booked']} / {results['full']} / {results['errors']}")
+    print(f"occupied spots     : {occupied}")
+    print(f"double bookings    : {double_booked}")
+    print(f"throughput         : {args.bookings / elapsed:.0f} bookings/sec")
+    return 1 if double_booked or occupied != results['booked'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
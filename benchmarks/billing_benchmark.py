@@ -0,0 +1,82 @@
+"""Per-row vs vectorized billing.
+
+Seeds released reservations in a temporary SQLite database, re-rates them one ORM
+object at a time with billing.charge() (the release_spot path), then again with the
+batch billing.rerate() (NumPy + one executemany UPDATE per chunk) and checks that both
+produce the same charges.
+
+    python benchmarks/billing_benchmark.py --reservations 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveParkingLot
+from controllers import billing
+
+
+def seed(reservations):
+    rng = random.Random(42)
+    db.session.add(User(id=1, username='driver', passhash='-', name='Driver', city='Delhi', pincode='110001'))
+    db.session.add(ParkingLot(id=1, parking_name='Bench', address='Main Road', city='Delhi', pincode='110001', price=20.0, number_of_spots=100))
+    db.session.execute(insert(ParkingSpot), [{'id': i, 'lot_id': 1, 'spot_number': 'P{:03d}'.format(i)} for i in range(1, 101)])
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(1, reservations + 1):
+        in_time = start + timedelta(seconds=rng.randint(0, 365 * 86400))
+        rows.append({'id': i, 'user_id': 1, 'spot_id': rng.randint(1, 100), 'in_time': in_time,
+                     'out_time': in_time + timedelta(seconds=rng.randint(60, 12 * 3600)), 'hours': 0, 'total_cost': 0,
+                     'vehicle_number': f'DL{i:08d}', 'is_release': True})
+    db.session.execute(insert(ReserveParkingLot), rows)
+    db.session.commit()
+
+
+def per_row(price):
+    start = time.perf_counter()
+    for booking in ReserveParkingLot.query.all():
+        booking.hours, booking.total_cost = billing.charge(booking.in_time, booking.out_time, price)
+    db.session.commit()
+    return time.perf_counter() - start
+
+
+def snapshot():
+    return db.session.query(ReserveParkingLot.id, ReserveParkingLot.hours, ReserveParkingLot.total_cost).order_by(ReserveParkingLot.id).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservations', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'billing_bench.db')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        seed(args.reservations)
+
+        row_seconds = per_row(25.0)
+        expected = snapshot()
+        db.session.expunge_all()
+
+        start = time.perf_counter()
+        billing.rerate(price=25.0)
+        batch_seconds = time.perf_counter() - start
+        assert snapshot() == expected, 'batch and per-row charges differ'
+
+    print(f"reservations : {args.reservations} ({'numpy' if billing.numpy() is not None else 'pure python'} batch)")
+    print(f"per-row      : {row_seconds:.2f}s ({args.reservations / row_seconds:.0f} rows/sec)")
+    print(f"batch        : {batch_seconds:.2f}s ({args.reservations / batch_seconds:.0f} rows/sec)")
+    print(f"speedup      : {row_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
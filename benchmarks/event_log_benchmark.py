@@ -0,0 +1,92 @@
+"""Reservation event log: group commits against one commit per event.
+
+--threads threads append --events booked/released events each, the way the routes do
+after their commits, once for every EVENT_LOG_BATCH given with --batch (1 = a write
+transaction per event). Reports events/sec until everything is committed, the number of
+write transactions & the p99 time spent appending (what a request pays). Then replays the
+occupancy projection from the log and compacts it.
+
+    python benchmarks/event_log_benchmark.py --threads 8 --events 2000 --batch 1 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.models import ReservationEvent
+from controllers import eventlog, synthetic
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))] * 1000
+
+
+def run(app, threads, events):
+    log = eventlog.EventLog(app, app.config['EVENT_LOG_BATCH'], app.config['EVENT_LOG_INTERVAL'])
+    barrier = threading.Barrier(threads + 1)
+    waits = []
+
+    def appender(number):
+        barrier.wait()
+        for event in range(events):
+            # Alternate booked & released of the thread's lot, so the projection stays balanced
+            kind, delta = (eventlog.BOOKED, 1) if event % 2 == 0 else (eventlog.RELEASED, -1)
+            start = time.perf_counter()
+            log.append([(kind, number % 5 + 1, number, event, number, delta, 0)])
+            waits.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=appender, args=(number,)) for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    start = time.perf_counter()
+    barrier.wait()
+    for worker in workers:
+        worker.join()
+    log.flush()
+    return time.perf_counter() - start, log.stats(), waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent request threads appending events')
+    parser.add_argument('--events', type=int, default=2000, help='Events appended by every thread')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 500], help='EVENT_LOG_BATCH values to compare')
+    parser.add_argument('--interval', type=float, default=0.05, help='EVENT_LOG_INTERVAL')
+    args = parser.parse_args()
+
+    app = create_app({
+        'AUTO_BOOTSTRAP': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'event_log_bench.db'),
+        'SECRET_KEY': 'event-log-benchmark',
+    })
+    with app.app_context():
+        synthetic.generate(10, 5, 100, 0, open_share=0)
+        synthetic.rebuild()
+
+    total = args.threads * args.events
+    print(f"{args.threads} threads x {args.events} events, interval {args.interval * 1000:.0f}ms")
+    print(f"{'batch':>7}{'events/s':>11}{'commits':>9}{'events/commit':>15}{'append p99':>12}")
+    for batch in args.batch:
+        app.config.update(EVENT_LOG_BATCH=batch, EVENT_LOG_INTERVAL=args.interval if batch > 1 else 0)
+        elapsed, stats, waits = run(app, args.threads, args.events)
+        print(f"{batch:>7}{total / elapsed:>11.0f}{stats['batches']:>9}{stats['committed'] / stats['batches']:>15.1f}"
+              f"{percentile(waits, 0.99):>10.3f}ms")
+
+    with app.app_context():
+        events = ReservationEvent.query.count()
+        start = time.perf_counter()
+        drift = eventlog.replay()
+        print(f"replayed {events} events in {time.perf_counter() - start:.2f}s, {len(drift)} lot(s) drifted")
+        start = time.perf_counter()
+        deleted = eventlog.compact(0)
+        print(f"compacted {deleted} events in {time.perf_counter() - start:.2f}s, {len(eventlog.replay())} lot(s) drifted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Query latency of the hot filters before and after the index migration.
+
+Seeds a temporary SQLite database (1M reservations by default), times the query
+shapes used by routes.py without indexes, applies models.migrations.upgrade() and
+times them again.
+
+    python benchmarks/index_benchmark.py --reservations 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models.models import db
+from models import migrations
+
+QUERIES = {
+    'spot_detail': ('SELECT id, in_time, vehicle_number FROM reserve_parking_lot '
+                    'WHERE spot_id = :spot_id AND is_release = 0 ORDER BY in_time DESC LIMIT 1'),
+    'show_spot occupants': ('SELECT r.spot_id, r.in_time FROM reserve_parking_lot r JOIN parking_spot s ON s.id = r.spot_id '
+                            'WHERE s.lot_id = :lot_id AND r.is_release = 0'),
+    'users_list stats': ('SELECT user_id, SUM(is_release = 0), SUM(is_release = 1) FROM reserve_parking_lot '
+                         'WHERE user_id IN (:user_id, :user_id + 1, :user_id + 2, :user_id + 3) GROUP BY user_id'),
+    'user active bookings': 'SELECT id FROM reserve_parking_lot WHERE user_id = :user_id AND is_release = 0',
+    'next free spot': ('SELECT id FROM parking_spot WHERE lot_id = :lot_id AND deleted_spot = 0 AND occupied = 0 '
+                       'ORDER BY spot_number LIMIT 1'),
+    'latest history': 'SELECT id FROM reserve_parking_lot WHERE is_release = 1 ORDER BY out_time DESC LIMIT 50',
+}
+
+
+RESERVATION_INSERT = ('INSERT INTO reserve_parking_lot (id, user_id, spot_id, in_time, out_time, hours, total_cost, vehicle_number, is_release) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+def seed(conn, lots, spots_per_lot, users, reservations):
+    rng = random.Random(42)
+    conn.executemany('INSERT INTO user (id, username, passhash, name, city, pincode, isadmin, deleted_user) VALUES (?, ?, ?, ?, ?, ?, 0, 0)',
+                     [(i, f'user{i}', '-', f'User {i}', 'Delhi', '110001') for i in range(1, users + 1)])
+    conn.executemany('INSERT INTO parking_lot (id, parking_name, address, city, pincode, price, number_of_spots, deleted_lot, last_spot_number) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)',
+                     [(i, f'Lot {i}', 'Main Road', 'Delhi', '110001', 20.0, spots_per_lot, spots_per_lot) for i in range(1, lots + 1)])
+    total_spots = lots * spots_per_lot
+    conn.executemany('INSERT INTO parking_spot (id, lot_id, spot_number, occupied, deleted_spot) VALUES (?, ?, ?, ?, 0)',
+                     [(i + 1, i // spots_per_lot + 1, 'P{:03d}'.format(i % spots_per_lot + 1), int(rng.random() < 0.5)) for i in range(total_spots)])
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(1, reservations + 1):
+        in_time = start + timedelta(minutes=i)
+        released = rng.random() < 0.98
+        batch.append((i, rng.randint(1, users), rng.randint(1, total_spots), in_time,
+                      in_time + timedelta(hours=2) if released else None, 2 if released else None,
+                      40.0 if released else None, f'DL{i:08d}', int(released)))
+        if len(batch) == 50000:
+            conn.executemany(RESERVATION_INSERT, batch)
+            batch = []
+    conn.executemany(RESERVATION_INSERT, batch)
+    return total_spots
+
+
+def time_queries(lots, users, total_spots, repeat):
+    rng = random.Random(7)
+    timings = {}
+    for name, sql in QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            db.session.execute(text(sql), {'spot_id': rng.randint(1, total_spots), 'lot_id': rng.randint(1, lots),
+                                           'user_id': rng.randint(1, users)}).all()
+        timings[name] = (time.perf_counter() - start) * 1000 / repeat
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--lots', type=int, default=50)
+    parser.add_argument('--spots-per-lot', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'index_bench.db')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        # Start from the pre-migration schema (no secondary indexes)
+        for _, _, statements in migrations.MIGRATIONS:
+            for statement in statements:
+                if isinstance(statement, str) and statement.startswith('CREATE INDEX IF NOT EXISTS '):
+                    db.session.execute(text('DROP INDEX IF EXISTS ' + statement.split()[5]))
+        db.session.commit()
+        conn = db.engine.raw_connection()
+        start = time.perf_counter()
+        total_spots = seed(conn, args.lots, args.spots_per_lot, args.users, args.reservations)
+        conn.commit()
+        conn.close()
+        print(f"seeded {args.reservations} reservations in {time.perf_counter() - start:.1f}s")
+
+        before = time_queries(args.lots, args.users, total_spots, args.repeat)
+        start = time.perf_counter()
+        migrations.upgrade()
+        print(f"migration applied in {time.perf_counter() - start:.1f}s")
+        after = time_queries(args.lots, args.users, total_spots, args.repeat)
+
+    print(f"{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        print(f"{name:<24}{before[name]:>12.3f}{after[name]:>12.3f}{before[name] / max(after[name], 1e-6):>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
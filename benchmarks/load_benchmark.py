@@ -0,0 +1,211 @@
+"""Load test of the booking lifecycle through the real routes.
+
+Seeds a temporary SQLite database with controllers.synthetic (lots, spots, users & reservation
+history from a fixed seed, so every run gets the same rows up to the current hour), then runs
+--threads virtual users, each with its own Flask test client, through --iterations of:
+
+    login_post -> home -> booking_detail (book) -> active_booking_post
+    -> booking_detail (release) -> release_spot -> dashboard -> booking_history
+
+and reports p50/p95/p99 latency, throughput and SQL statements per endpoint (read from
+the Server-Timing header added by controllers.metrics). Results are written to a JSON
+file; --compare checks them against an earlier run and exits with 1 when an endpoint
+got slower (p95) or runs more queries than the baseline allows (--tolerance).
+
+    python benchmarks/load_benchmark.py --threads 8 --iterations 20 --output baseline.json
+    python benchmarks/load_benchmark.py --threads 8 --iterations 20 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.models import User, ReserveParkingLot
+from controllers import synthetic
+
+PASSWORD = 'loadtest'
+ENDPOINTS = ('login_post', 'home', 'booking_detail', 'active_booking_post', 'release_spot', 'dashboard', 'booking_history')
+
+
+# <--------------------Virtual User-------------------->
+def server_timing_queries(response):
+    match = re.search(r'desc="(\d+) queries"', response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+def virtual_user(app, number, username, iterations, lots, samples, errors):
+    rng = random.Random(number)
+    client = app.test_client()
+
+    def call(endpoint, method, path, data=None):
+        start = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - start
+        samples.append((endpoint, elapsed, server_timing_queries(response)))
+        if response.status_code >= 400:
+            errors.append((endpoint, response.status_code))
+        return response
+
+    for iteration in range(iterations):
+        call('login_post', 'POST', '/login', {'username': username, 'password': PASSWORD})
+        call('home', 'GET', '/home')
+        lot_id = rng.randint(1, lots)
+        html = call('booking_detail', 'GET', f'/booking_detail/{lot_id}/true').get_data(as_text=True)
+        spot = re.search(r'name="spot_number"[^>]*value="([^"]+)"', html)
+        in_time = re.search(r'name="in_time"[^>]*value="([^"]+)"', html)
+        if not spot or not in_time:
+            errors.append(('booking_detail', 'lot full'))
+            continue
+        plate = f'LT{number:04d}{iteration:06d}'
+        call('active_booking_post', 'POST', f'/active_booking_post/{lot_id}',
+             {'spot_number': spot.group(1), 'in_time': in_time.group(1), 'vehicle_number': plate})
+        # Booking id of the new reservation (not timed)
+        with app.app_context():
+            booking = ReserveParkingLot.query.filter_by(plate=plate, is_release=False).first()
+            booking_id = booking.id if booking else None
+        if booking_id is None:
+            errors.append(('active_booking_post', 'not booked'))
+            continue
+        call('booking_detail', 'GET', f'/booking_detail/{booking_id}/false')
+        call('release_spot', 'POST', f'/release_spot/{booking_id}')
+        call('dashboard', 'GET', '/dashboard')
+        call('booking_history', 'GET', '/booking_history')
+        client.get('/logout')
+
+
+# <--------------------Report-------------------->
+def percentile(values, share):
+    # Nearest-rank percentile of sorted values
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))]
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        times = sorted(seconds for name, seconds, _ in samples if name == endpoint)
+        if not times:
+            continue
+        queries = [count for name, _, count in samples if name == endpoint]
+        endpoints[endpoint] = {
+            'requests': len(times),
+            'p50_ms': percentile(times, 0.50) * 1000,
+            'p95_ms': percentile(times, 0.95) * 1000,
+            'p99_ms': percentile(times, 0.99) * 1000,
+            'mean_queries': sum(queries) / len(queries),
+            'max_queries': max(queries),
+            'throughput_rps': len(times) / elapsed,
+        }
+    return endpoints
+
+
+def print_report(endpoints, total, elapsed, baseline=None):
+    print(f"{len(total)} requests in {elapsed:.1f}s ({len(total) / elapsed:.0f} req/s)")
+    print(f"{'endpoint':<22}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'req/s':>8}" + ('  vs baseline p95 / queries' if baseline else ''))
+    for endpoint, stats in endpoints.items():
+        line = (f"{endpoint:<22}{stats['requests']:>9}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{stats['mean_queries']:>9.1f}{stats['throughput_rps']:>8.0f}")
+        if baseline and endpoint in baseline:
+            before = baseline[endpoint]
+            line += f"  {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+6.0f}% / {stats['mean_queries'] - before['mean_queries']:+.1f}"
+        print(line)
+
+
+def regressions(endpoints, baseline, tolerance):
+    found = []
+    for endpoint, stats in endpoints.items():
+        before = baseline.get(endpoint)
+        if not before:
+            continue
+        if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f"{endpoint}: p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+        # Query counts are deterministic, any increase is a regression
+        if stats['mean_queries'] > before['mean_queries'] + 0.5:
+            found.append(f"{endpoint}: queries {before['mean_queries']:.1f} -> {stats['mean_queries']:.1f}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lots', type=int, default=20)
+    parser.add_argument('--spots-per-lot', type=int, default=100)
+    parser.add_argument('--open-share', type=float, default=0.1, help='Share of spots taken by open bookings')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--reservations', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=20, help='Booking lifecycles per virtual user')
+    parser.add_argument('--output', '-o', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown against --compare (0.25 = 25%%)')
+    args = parser.parse_args()
+    if args.threads > args.users:
+        parser.error('--threads must not exceed --users (one user per virtual user)')
+
+    app = create_app({
+        'AUTO_BOOTSTRAP': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'load_bench.db'),
+        'SECRET_KEY': 'load-benchmark',
+        # Only the Server-Timing header is used here
+        'SQL_QUERY_THRESHOLD': 10 ** 6,
+    })
+    with app.app_context():
+        start = time.perf_counter()
+        # Same rows on every run, history ending at the current hour
+        written = synthetic.generate(args.users, args.lots, args.spots_per_lot, args.reservations, seed=42,
+                                     open_share=args.open_share, password=PASSWORD)
+        synthetic.rebuild()
+        print(f"seeded {written} in {time.perf_counter() - start:.1f}s")
+        usernames = [username for (username,) in User.query.filter_by(isadmin=False).order_by(User.id).with_entities(User.username).limit(args.threads)]
+
+    samples, errors = [], []
+    threads = [threading.Thread(target=virtual_user, args=(app, number, username, args.iterations, args.lots, samples, errors))
+               for number, username in enumerate(usernames, start=1)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints = summarize(samples, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['endpoints']
+    print_report(endpoints, samples, elapsed, baseline)
+    if errors:
+        print(f"{len(errors)} errors, first: {errors[:5]}")
+
+    if args.output:
+        results = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'settings': {name: getattr(args, name) for name in ('lots', 'spots_per_lot', 'open_share', 'users', 'reservations', 'threads', 'iterations')},
+            'elapsed_s': elapsed,
+            'throughput_rps': len(samples) / elapsed,
+            'errors': len(errors),
+            'endpoints': endpoints,
+        }
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"results written to {args.output}")
+
+    if baseline:
+        found = regressions(endpoints, baseline, args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Login storm: many users log in at once while others keep browsing.
+
+Seeds a temporary SQLite database with --logins users, then for every mode starts
+--browsers threads loading /home in a loop and releases --logins threads that all
+POST /login at the same moment. Reports login p50/p99 and the /home latency during
+the storm:
+
+    inline  password hashed in the request thread (PASSWORD_WORKERS=0)
+    pool    hashed in the worker's bounded process pool (PASSWORD_WORKERS, PASSWORD_CONCURRENCY)
+
+Finally a brute-force burst of wrong passwords against one username shows how many
+attempts were hashed before the failed-attempt throttle rejected the rest.
+
+    python benchmarks/login_benchmark.py --logins 50 --browsers 4 --method scrypt:32768:8:1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.models import User
+from controllers import synthetic, passwords
+
+PASSWORD = 'loginbench'
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))] * 1000
+
+
+def storm(app, usernames, browsers):
+    barrier = threading.Barrier(len(usernames) + 1)
+    started, done = threading.Event(), threading.Event()
+    logins, pages = [], []
+
+    def login(username):
+        client = app.test_client()
+        barrier.wait()
+        start = time.perf_counter()
+        response = client.post('/login', data={'username': username, 'password': PASSWORD})
+        logins.append(time.perf_counter() - start)
+        assert response.status_code == 302, response.status_code
+
+    def browse():
+        client = app.test_client()
+        client.post('/login', data={'username': usernames[0], 'password': PASSWORD})
+        started.wait()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/home')
+            pages.append(time.perf_counter() - start)
+
+    browser_threads = [threading.Thread(target=browse) for _ in range(browsers)]
+    login_threads = [threading.Thread(target=login, args=(username,)) for username in usernames]
+    for thread in browser_threads + login_threads:
+        thread.start()
+    time.sleep(0.5 + 0.5 * browsers)  # Browsers logged in (hashed) before the storm
+    start = time.perf_counter()
+    started.set()
+    barrier.wait()
+    for thread in login_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in browser_threads:
+        thread.join()
+    return logins, pages, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=50, help='Users logging in at the same moment')
+    parser.add_argument('--browsers', type=int, default=4, help='Threads loading /home during the storm')
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='PASSWORD_HASH_METHOD')
+    parser.add_argument('--workers', type=int, default=1, help='PASSWORD_WORKERS of the pool mode')
+    parser.add_argument('--concurrency', type=int, default=4, help='PASSWORD_CONCURRENCY of the pool mode')
+    parser.add_argument('--burst', type=int, default=50, help='Wrong passwords sent for one username')
+    args = parser.parse_args()
+
+    app = create_app({
+        'AUTO_BOOTSTRAP': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'login_bench.db'),
+        'SECRET_KEY': 'login-benchmark',
+        'PASSWORD_HASH_METHOD': args.method,
+        'PASSWORD_QUEUE_TIMEOUT': 600,
+    })
+    with app.app_context():
+        synthetic.generate(args.logins, 1, 10, 0, open_share=0, password=PASSWORD)
+        synthetic.rebuild()
+        usernames = [username for (username,) in User.query.filter_by(isadmin=False).with_entities(User.username)]
+
+    print(f"{args.logins} simultaneous logins ({args.method}) with {args.browsers} threads browsing /home, {os.cpu_count()} CPU(s)")
+    print(f"{'mode':<22}{'login p50':>11}{'login p99':>11}{'logins/s':>10}{'home p50':>10}{'home p99':>10}{'pages':>7}")
+    for mode, workers in (('inline', 0), (f'pool {args.workers}x{args.concurrency}', args.workers)):
+        app.config.update(PASSWORD_WORKERS=workers, PASSWORD_CONCURRENCY=args.concurrency)
+        if workers:
+            # Start the pool's processes outside of the measurement
+            with app.app_context():
+                passwords.verify_password(passwords.hash_password(PASSWORD), PASSWORD)
+        logins, pages, elapsed = storm(app, usernames, args.browsers)
+        print(f"{mode:<22}{percentile(logins, 0.5):>9.0f}ms{percentile(logins, 0.99):>9.0f}ms{len(logins) / elapsed:>10.1f}"
+              f"{percentile(pages, 0.5) if pages else 0:>8.0f}ms{percentile(pages, 0.99) if pages else 0:>8.0f}ms{len(pages):>7}")
+
+    # Brute force burst against one username
+    client = app.test_client()
+    start = time.perf_counter()
+    rejected = 0
+    for _ in range(args.burst):
+        response = client.post('/login', data={'username': usernames[-1], 'password': 'wrong'}, follow_redirects=True)
+        rejected += 'Too many failed attempts' in response.get_data(as_text=True)
+    elapsed = time.perf_counter() - start
+    print(f"brute force: {args.burst} wrong passwords in {elapsed:.2f}s, {args.burst - rejected} hashed, {rejected} rejected by the throttle")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Find the open booking of a vehicle at growing history sizes.
+
+For each history size, seeds a temporary SQLite database (2% of bookings still open) and
+times three lookups of random parked vehicles:
+
+  ilike scan : the old path, vehicle_number ILIKE 'q%' over the 4-table booking join
+  plate index: ReserveParkingLot.plate through the ux_reserve_open_plate partial index
+  plate map  : plates.open_plates (in-memory plate -> booking_id, then a primary key read)
+
+    python benchmarks/plate_lookup_benchmark.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveParkingLot
+from controllers.plates import OpenPlateIndex
+
+
+def seed(conn, reservations, spots=500):
+    rng = random.Random(42)
+    conn.execute("INSERT INTO user (id, username, passhash, name, city, pincode, isadmin, deleted_user) VALUES (1, 'user1', '-', 'User 1', 'Delhi', '110001', 0, 0)")
+    conn.execute("INSERT INTO parking_lot (id, parking_name, address, city, pincode, price, number_of_spots, deleted_lot, last_spot_number) "
+                 "VALUES (1, 'Lot 1', 'Main Road', 'Delhi', '110001', 20.0, ?, 0, ?)", (spots, spots))
+    conn.executemany('INSERT INTO parking_spot (id, lot_id, spot_number, occupied, deleted_spot) VALUES (?, 1, ?, 0, 0)',
+                     [(i, 'P{:03d}'.format(i)) for i in range(1, spots + 1)])
+    start, rows, parked = datetime(2024, 1, 1), [], []
+    for i in range(1, reservations + 1):
+        released = rng.random() < 0.98
+        in_time = start + timedelta(minutes=i)
+        plate = f'DL{i:08d}'
+        if not released:
+            parked.append(plate)
+        rows.append((i, rng.randint(1, spots), in_time.strftime('%Y-%m-%d %H:%M:%S.000000'), plate, plate, int(released)))
+    conn.executemany('INSERT INTO reserve_parking_lot (id, user_id, spot_id, in_time, vehicle_number, plate, is_release) VALUES (?, 1, ?, ?, ?, ?, ?)', rows)
+    return parked
+
+
+def timed(lookup, plates):
+    start = time.perf_counter()
+    for plate in plates:
+        assert lookup(plate) is not None, plate
+        # Every gate request starts with an empty session
+        db.session.expunge_all()
+    return (time.perf_counter() - start) * 1e6 / len(plates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'history':>10}{'ilike scan us':>16}{'plate index us':>16}{'plate map us':>14}")
+    for size in args.sizes:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'plate_bench.db')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            conn = db.engine.raw_connection()
+            parked = seed(conn, size)
+            conn.commit()
+            conn.close()
+            plates = random.Random(7).choices(parked, k=args.lookups)
+
+            scan = timed(lambda plate: ReserveParkingLot.query.join(User).join(ParkingSpot).join(ParkingLot)
+                         .filter(ReserveParkingLot.vehicle_number.ilike(f'{plate}%'), ReserveParkingLot.is_release == False).first(),
+                         plates[:20])
+            index = timed(lambda plate: ReserveParkingLot.query.filter_by(plate=plate, is_release=False).first(), plates)
+            open_plates = OpenPlateIndex()
+            open_plates.open_booking(plates[0])
+            mapped = timed(open_plates.open_booking, plates)
+        print(f"{size:>10}{scan:>16.1f}{index:>16.1f}{mapped:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
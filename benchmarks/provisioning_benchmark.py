@@ -0,0 +1,63 @@
+"""Spot provisioning cost for small and very large lots.
+
+For each lot size, times the old per-object path (one ParkingSpot ORM object per spot
+with add_all) against provisioning.add_spots(), then times a shrink by half and a grow
+back to full size through provisioning.resize().
+
+    python benchmarks/provisioning_benchmark.py --sizes 10 1000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models.models import db, ParkingLot, ParkingSpot
+from controllers import provisioning
+
+
+def new_lot(name, spots):
+    lot = ParkingLot(parking_name=name, address='Main Road', city='Delhi', pincode='110001', price=20.0, number_of_spots=spots)
+    db.session.add(lot)
+    db.session.flush()
+    return lot
+
+
+def timed(action):
+    start = time.perf_counter()
+    action()
+    db.session.commit()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 50000])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'provisioning_bench.db')
+    db.init_app(app)
+    print(f"{'spots':>8}{'orm create ms':>16}{'bulk create ms':>16}{'shrink ms':>12}{'grow ms':>12}")
+    with app.app_context():
+        db.create_all()
+        for size in args.sizes:
+            lot = new_lot(f'Orm {size}', size)
+            orm_ms = timed(lambda: db.session.add_all([ParkingSpot(lot_id=lot.id, spot_number='P{:03d}'.format(i + 1), occupied=False) for i in range(size)]))
+            db.session.expunge_all()
+
+            lot = new_lot(f'Bulk {size}', size)
+            bulk_ms = timed(lambda: provisioning.add_spots(lot, size))
+            shrink_ms = timed(lambda: provisioning.resize(lot, -(size // 2)))
+            grow_ms = timed(lambda: provisioning.resize(lot, size // 2 + size))
+            active = ParkingSpot.query.filter_by(lot_id=lot.id, deleted_spot=False).count()
+            assert active == 2 * size, (active, size)
+            db.session.expunge_all()
+            print(f"{size:>8}{orm_ms:>16.1f}{bulk_ms:>16.1f}{shrink_ms:>12.1f}{grow_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
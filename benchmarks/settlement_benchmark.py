@@ -0,0 +1,85 @@
+"""End-of-day settlement of many open bookings.
+
+Seeds a temporary SQLite database with N open bookings spread over a few lots, times
+releasing a sample one by one with bookings.release() (one transaction each, like
+release_spot), then settles everything left with bookings.settle() in one transaction.
+
+    python benchmarks/settlement_benchmark.py --open-bookings 10000 --lots 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models.models import db, ParkingSpot, ReserveParkingLot, LotOccupancy
+from controllers import bookings, occupancy, eventlog
+
+
+def seed(conn, lots, open_bookings, users=1000):
+    rng = random.Random(42)
+    spots_per_lot = open_bookings // lots + 1
+    conn.executemany('INSERT INTO user (id, username, passhash, name, city, pincode, isadmin, deleted_user) VALUES (?, ?, ?, ?, ?, ?, 0, 0)',
+                     [(i, f'user{i}', '-', f'User {i}', 'Delhi', '110001') for i in range(1, users + 1)])
+    conn.executemany('INSERT INTO parking_lot (id, parking_name, address, city, pincode, price, number_of_spots, deleted_lot, last_spot_number) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)',
+                     [(i, f'Lot {i}', 'Main Road', 'Delhi', '110001', 20.0 + i, spots_per_lot, spots_per_lot) for i in range(1, lots + 1)])
+    spots = [(lot_id - 1) * spots_per_lot + number for lot_id in range(1, lots + 1) for number in range(1, spots_per_lot + 1)]
+    conn.executemany('INSERT INTO parking_spot (id, lot_id, spot_number, occupied, deleted_spot) VALUES (?, ?, ?, 0, 0)',
+                     [(spot_id, (spot_id - 1) // spots_per_lot + 1, 'P{:03d}'.format((spot_id - 1) % spots_per_lot + 1)) for spot_id in spots])
+    booked = rng.sample(spots, open_bookings)
+    conn.executemany('UPDATE parking_spot SET occupied = 1 WHERE id = ?', [(spot_id,) for spot_id in booked])
+    now = datetime.now()
+    conn.executemany('INSERT INTO reserve_parking_lot (id, user_id, spot_id, in_time, vehicle_number, plate, is_release) VALUES (?, ?, ?, ?, ?, ?, 0)', [
+        (i, rng.randint(1, users), spot_id, (now - timedelta(minutes=rng.randint(1, 600))).strftime('%Y-%m-%d %H:%M:%S.000000'), f'DL{i:08d}', f'DL{i:08d}')
+        for i, spot_id in enumerate(booked, start=1)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--open-bookings', type=int, default=10000)
+    parser.add_argument('--lots', type=int, default=5)
+    parser.add_argument('--sample', type=int, default=200, help='Bookings released one by one first')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'settlement_bench.db')
+    # release() & settle() append to the reservation event log like the routes do
+    app.config.update(EVENT_LOG_BATCH=500, EVENT_LOG_INTERVAL=0.05)
+    db.init_app(app)
+    eventlog.init_event_log(app)
+    with app.app_context():
+        db.create_all()
+        conn = db.engine.raw_connection()
+        seed(conn, args.lots, args.open_bookings)
+        conn.commit()
+        conn.close()
+        occupancy.reconcile()
+        lot_ids = list(range(1, args.lots + 1))
+
+        start = time.perf_counter()
+        for booking in ReserveParkingLot.query.order_by(ReserveParkingLot.id).limit(args.sample).all():
+            bookings.release(booking)
+        per_row = (time.perf_counter() - start) / args.sample
+
+        remaining = ReserveParkingLot.query.filter_by(is_release=False).count()
+        start = time.perf_counter()
+        settled = bookings.settle(lot_ids)
+        elapsed = time.perf_counter() - start
+
+        assert settled == remaining, (settled, remaining)
+        assert ParkingSpot.query.filter_by(occupied=True).count() == 0
+        assert db.session.query(db.func.sum(LotOccupancy.occupied)).scalar() == 0
+        eventlog.log().flush()
+
+    print(f"per-row release : {per_row * 1000:.2f} ms/booking ({1 / per_row:.0f} bookings/sec, {remaining * per_row:.1f}s for {remaining})")
+    print(f"bulk settle     : {settled} bookings in {elapsed:.2f}s ({settled / elapsed:.0f} bookings/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Fan-out of occupancy events from one worker to many live screens.
+
+Starts N subscriber threads on an events.OccupancyHub (one per connected SSE client,
+as under a threaded or gevent worker), publishes M events and reports the publish cost
+and the latency until every subscriber received each event.
+
+    python benchmarks/sse_fanout_benchmark.py --clients 500 --events 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.events import OccupancyHub, RESYNC
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.005, help='Seconds between published events')
+    args = parser.parse_args()
+
+    hub = OccupancyHub()
+    latencies, resyncs, lock = [], [0], threading.Lock()
+
+    def client():
+        subscriber = hub.subscribe()
+        received = 0
+        while received < args.events:
+            event = subscriber.get()
+            if event is RESYNC:
+                with lock:
+                    resyncs[0] += 1
+                break
+            with lock:
+                latencies.append(time.perf_counter() - event[1]['sent'])
+            received += 1
+        hub.unsubscribe(subscriber)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    while hub.stats()['subscribers'] < args.clients:
+        time.sleep(0.01)
+
+    publish_times = []
+    for i in range(args.events):
+        start = time.perf_counter()
+        hub.publish(('occupancy', {'lot_id': i % 10, 'occupied': i, 'available_count': 0, 'number_of_spots': i, 'sent': start}))
+        publish_times.append(time.perf_counter() - start)
+        time.sleep(args.interval)
+    for thread in threads:
+        thread.join(30)
+
+    latencies.sort()
+    print(f"clients        : {args.clients}, events: {args.events}, delivered: {len(latencies)}, resyncs: {resyncs[0]}")
+    print(f"publish        : {statistics.mean(publish_times) * 1000:.2f} ms per event to all clients")
+    print(f"latency p50/p99: {latencies[len(latencies) // 2] * 1000:.1f} / {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Cold start of one worker: fresh interpreter, import app, build the app, serve the first request.
+
+Runs every mode in a new Python process against an already initialised temporary database
+and reports the median wall time: `lazy` is create_app() as the workers run it, `bootstrap`
+also creates tables, runs migrations & checks the admin user (AUTO_BOOTSTRAP, the old import
+time behaviour). `--login` adds a login as first request, which includes a password hash.
+
+    python benchmarks/startup_benchmark.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a new interpreter for every run, prints the elapsed seconds
+CHILD = """
+import time
+start = time.perf_counter()
+from app import create_app
+app = create_app({{'AUTO_BOOTSTRAP': {bootstrap}}})
+client = app.test_client()
+if {login}:
+    response = client.post('/login', data={{'username': 'admin', 'password': 'admin'}})
+else:
+    response = client.get('/login')
+assert response.status_code in (200, 302), response.status_code
+print(time.perf_counter() - start)
+"""
+
+
+def run(bootstrap, login, env):
+    output = subprocess.run([sys.executable, '-c', CHILD.format(bootstrap=bootstrap, login=login)],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--login', action='store_true', help='First request is a login instead of the login page')
+    args = parser.parse_args()
+
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup_bench.db'))
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=ROOT, env=env, check=True, capture_output=True)
+
+    print(f"{'mode':>10}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for mode, bootstrap in (('lazy', False), ('bootstrap', True)):
+        timings = [run(bootstrap, args.login, env) for _ in range(args.runs)]
+        print(f"{mode:>10}{statistics.median(timings):>12.1f}{min(timings):>10.1f}{max(timings):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
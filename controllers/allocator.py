@@ -0,0 +1,118 @@
+import heapq
+import threading
+from sqlalchemy import update
+from models.models import db, ParkingSpot
+from controllers.provisioning import spot_index
+
+class SpotAllocator:
+    """Hand out free parking spots lot wise without double booking.
+
+    Each lot keeps an in-memory heap of its free spots ordered by spot number, so the
+    next spot is picked in O(log n) without scanning ParkingSpot. The heap is only a hint,
+    the spot is claimed in the database with a conditional UPDATE that succeeds only if
+    the spot is still free, and a lost race simply moves on to the next spot.
+    """
+
+    def __init__(self, max_retries=5):
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        # lot_id -> heap of (spot_index, spot_id, spot_number)
+        self._heaps = {}
+        # lot_id -> set of spot_id still free in the heap (lazy deletion of stale heap entries)
+        self._free = {}
+
+    # <--------------------Load Free Spots of a Lot-------------------->
+    def _load(self, lot_id):
+        free_spots = db.session.query(ParkingSpot.spot_number, ParkingSpot.id)\
+            .filter_by(lot_id=lot_id, occupied=False, deleted_spot=False).all()
+        heap = [(spot_index(spot_number), spot_id, spot_number) for spot_number, spot_id in free_spots]
+        heapq.heapify(heap)
+        self._heaps[lot_id] = heap
+        self._free[lot_id] = {spot_id for _, spot_id, _ in heap}
+
+    def _pop(self, lot_id):
+        # Pop the lowest free spot, skipping entries which are already claimed or removed
+        heap, free = self._heaps[lot_id], self._free[lot_id]
+        while heap:
+            _, spot_id, spot_number = heapq.heappop(heap)
+            if spot_id in free:
+                free.discard(spot_id)
+                return spot_id, spot_number
+        return None
+
+    def _next_candidate(self, lot_id, reload):
+        with self._lock:
+            if reload or lot_id not in self._heaps:
+                self._load(lot_id)
+            return self._pop(lot_id)
+
+    # <--------------------Peek Next Free Spot-------------------->
+    def peek(self, lot_id):
+        """Return (spot_id, spot_number) of the spot the next claim would get, or None."""
+        with self._lock:
+            if lot_id not in self._heaps or not self._free[lot_id]:
+                self._load(lot_id)
+            heap, free = self._heaps[lot_id], self._free[lot_id]
+            while heap and heap[0][1] not in free:
+                heapq.heappop(heap)
+            if not heap:
+                return None
+            _, spot_id, spot_number = heap[0]
+            return spot_id, spot_number
+
+    # <--------------------Claim a Spot Atomically-------------------->
+    def _try_claim(self, lot_id, **spot_filter):
+        result = db.session.execute(
+            update(ParkingSpot)
+            .filter_by(lot_id=lot_id, occupied=False, deleted_spot=False, **spot_filter)
+            .values(occupied=True)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def claim(self, lot_id, spot_number=None):
+        """Mark a free spot of the lot as occupied in the current transaction.
+
+        The requested spot_number is tried first, otherwise the lowest free spot is used.
+        Returns (spot_id, spot_number) or None when the lot is full. The caller commits,
+        and must call release() with the same spot if the transaction is rolled back.
+        """
+        if spot_number:
+            spot_id = db.session.query(ParkingSpot.id).filter_by(lot_id=lot_id, spot_number=spot_number).scalar()
+            if spot_id and self._try_claim(lot_id, id=spot_id):
+                with self._lock:
+                    self._free.get(lot_id, set()).discard(spot_id)
+                return spot_id, spot_number
+        # Lost the race (or no preference), take the next spot from the heap
+        reload = False
+        for _ in range(self.max_retries + 1):
+            candidate = self._next_candidate(lot_id, reload)
+            if candidate is None:
+                # Heap may be stale after releases from other workers, reload it once
+                if reload:
+                    return None
+                reload = True
+                continue
+            spot_id, candidate_number = candidate
+            if self._try_claim(lot_id, id=spot_id):
+                return spot_id, candidate_number
+            # Another worker took it, so this heap is stale, rebuild it before the next try
+            reload = True
+        return None
+
+    # <--------------------Return a Spot to the Heap-------------------->
+    def release(self, lot_id, spot_id, spot_number):
+        # Only for active spots, a deleted spot must not come back into the heap
+        with self._lock:
+            if lot_id in self._heaps and spot_id not in self._free[lot_id]:
+                heapq.heappush(self._heaps[lot_id], (spot_index(spot_number), spot_id, spot_number))
+                self._free[lot_id].add(spot_id)
+
+    # <--------------------Drop a Lot After Spots Change-------------------->
+    def invalidate(self, lot_id):
+        # Next peek/claim rebuilds the heap from ParkingSpot
+        with self._lock:
+            self._heaps.pop(lot_id, None)
+            self._free.pop(lot_id, None)
+
+allocator = SpotAllocator()
@@ -0,0 +1,128 @@
+import json
+from datetime import datetime
+from functools import wraps
+from flask import Blueprint, Response, request, session, current_app, g, stream_with_context
+from models.models import db, ReserveParkingLot
+from controllers.plates import open_plates, normalize
+from controllers import occupancy, bookings, cache, events
+
+# JSON API for gate kiosks & number plate cameras, no templates on this path
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+def init_api(app):
+    app.register_blueprint(api)
+
+# <--------------------Compact JSON Responses-------------------->
+def _json(data, status=200):
+    # No indentation or spaces, datetimes as ISO strings
+    body = json.dumps(data, separators=(',', ':'), default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+    return Response(body, status=status, mimetype='application/json')
+
+def _error(message, status):
+    return _json({'error': message}, status)
+
+def _booking(booking):
+    return {
+        'id': booking.id,
+        'user_id': booking.user_id,
+        'lot_id': booking.parking_spot.lot_id,
+        'spot_id': booking.spot_id,
+        'spot_number': booking.parking_spot.spot_number,
+        'vehicle_number': booking.vehicle_number,
+        'in_time': booking.in_time,
+        'out_time': booking.out_time,
+        'hours': booking.hours,
+        'total_cost': booking.total_cost,
+        'is_release': booking.is_release,
+    }
+
+# <--------------------Authentication-------------------->
+def api_auth(func):
+    """Allow devices sending a key from API_KEYS in the X-API-Key header, or a logged-in user.
+    Sets g.current_user to the logged-in user (None for devices)."""
+    @wraps(func)
+    def approve_auth(*args, **kwargs):
+        api_key = request.headers.get('X-API-Key')
+        if api_key:
+            if api_key not in current_app.config['API_KEYS']:
+                return _error('Invalid API key', 401)
+            g.current_user = None
+            return func(*args, **kwargs)
+        user = cache.get_user(session['user_id']) if 'user_id' in session else None
+        if user is None:
+            return _error('Authentication required', 401)
+        g.current_user = user
+        return func(*args, **kwargs)
+    return approve_auth
+
+# <--------------------Book a Spot-------------------->
+@api.route('/lots/<int:lot_id>/bookings', methods=['POST'])
+@api_auth
+def book(lot_id):
+    """Body: {"vehicle_number", "spot_number" (optional), "user_id" (devices only)}."""
+    data = request.get_json(silent=True) or {}
+    vehicle_number = (data.get('vehicle_number') or '').strip()
+    if not vehicle_number:
+        return _error('vehicle_number is required', 400)
+    # Devices book on behalf of a user, logged-in users book for themselves
+    user_id = g.current_user.id if g.current_user else data.get('user_id')
+    user = cache.get_user(user_id) if isinstance(user_id, int) else None
+    if user is None or user.deleted_user:
+        return _error('Unknown user_id', 400)
+    lot = cache.get_lot(lot_id)
+    if lot is None or lot.deleted_lot:
+        return _error('Parking lot not found', 404)
+    try:
+        reservation = bookings.book(user.id, lot_id, vehicle_number, spot_number=data.get('spot_number'))
+    except bookings.VehicleAlreadyParked:
+        return _error('Vehicle already has an open booking', 409)
+    if not reservation:
+        return _error('No free spot left in this parking lot', 409)
+    return _json(_booking(reservation), 201)
+
+# <--------------------Release a Spot-------------------->
+@api.route('/bookings/<int:booking_id>/release', methods=['POST'])
+@api_auth
+def release(booking_id):
+    booking = db.session.get(ReserveParkingLot, booking_id)
+    if booking is None:
+        return _error('Booking not found', 404)
+    # Users may only release their own bookings, admins & devices any booking
+    if g.current_user and not g.current_user.isadmin and booking.user_id != g.current_user.id:
+        return _error('Not your booking', 403)
+    if booking.is_release or not bookings.release(booking):
+        return _error('Booking is already released', 409)
+    return _json(_booking(booking))
+
+# <--------------------Lot Occupancy-------------------->
+@api.route('/occupancy')
+@api_auth
+def occupancy_all():
+    lot_ids = [lot.id for lot in cache.get_lots()]
+    return _json([{'lot_id': lot_id, **status} for lot_id, status in sorted(occupancy.lot_status(lot_ids).items())])
+
+@api.route('/lots/<int:lot_id>/occupancy')
+@api_auth
+def occupancy_lot(lot_id):
+    lot = cache.get_lot(lot_id)
+    if lot is None or lot.deleted_lot:
+        return _error('Parking lot not found', 404)
+    return _json({'lot_id': lot_id, **occupancy.lot_status([lot_id])[lot_id]})
+
+@api.route('/occupancy/stream')
+@api_auth
+def occupancy_stream():
+    # Server-Sent Events, same stream as /occupancy/stream
+    response = Response(stream_with_context(events.stream(request.args.getlist('lot_id', type=int))), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# <--------------------Open Booking of a Vehicle-------------------->
+@api.route('/vehicles/<string:vehicle_number>/booking')
+@api_auth
+def vehicle_booking(vehicle_number):
+    booking = open_plates.open_booking(normalize(vehicle_number))
+    if booking is None or (g.current_user and not g.current_user.isadmin and booking.user_id != g.current_user.id):
+        return _error('No open booking for this vehicle', 404)
+    return _json(_booking(booking))
@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import aliased
+from models.models import db, ReserveParkingLot, ArchivedReservation
+from controllers import search
+
+# Hot/cold split of the booking history: released bookings older than ARCHIVE_AFTER_DAYS move from
+# reserve_parking_lot to reserve_parking_lot_archive, so the open-booking pages, spot lookups & plate
+# checks only ever touch recent rows. History, rollups & exports read both tables.
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [column.name for column in ReserveParkingLot.__table__.columns]
+COLUMN_LIST = ', '.join(COLUMNS)
+
+# <--------------------Read Both Tables-------------------->
+def history():
+    """ReserveParkingLot aliased over hot UNION ALL archived rows, for aggregates & exports.
+
+    Filters on the alias are pushed into both halves by SQLite. Ordered pages query each
+    table on its own index & merge (booking_history), a union can't be read in index order.
+    """
+    rows = union_all(
+        select(*(getattr(ReserveParkingLot, name) for name in COLUMNS)),
+        select(*(getattr(ArchivedReservation, name) for name in COLUMNS)),
+    ).subquery('reservations')
+    return aliased(ReserveParkingLot, rows)
+
+# <--------------------Move a Batch-------------------->
+def archive_batch(cutoff, batch_size):
+    """Move up to batch_size bookings released before cutoff in one transaction, return how many moved."""
+    connection = db.session.connection()
+    # The INSERT is the first statement, so the write lock is taken before the rows are picked
+    ids = connection.exec_driver_sql(
+        f'INSERT INTO reserve_parking_lot_archive ({COLUMN_LIST}) SELECT {COLUMN_LIST} FROM reserve_parking_lot '
+        'WHERE is_release = 1 AND out_time < ? ORDER BY is_release, out_time LIMIT ? RETURNING id',
+        (cutoff.strftime('%Y-%m-%d %H:%M:%S.%f'), batch_size)
+    ).all()
+    if not ids:
+        db.session.commit()
+        return 0
+    ids = [tuple(row) for row in ids]
+    connection.exec_driver_sql('DELETE FROM reserve_parking_lot WHERE id = ?', ids)
+    # The delete trigger dropped them from the search index, archived bookings stay searchable by vehicle
+    if search.enabled():
+        connection.exec_driver_sql('INSERT INTO reservation_search (rowid, vehicle_number) '
+                                   'SELECT id, vehicle_number FROM reserve_parking_lot_archive WHERE id = ?', ids)
+    db.session.commit()
+    return len(ids)
+
+def run(after_days, batch_size=5000, pause=0.1, max_batches=None):
+    """Archive every booking released more than after_days ago in bounded batches, return how many moved.
+
+    Sleeps `pause` seconds between batches so bookings & releases get the write lock in between.
+    """
+    cutoff = datetime.now() - timedelta(days=after_days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    return moved
+
+# <--------------------Background Archival Job-------------------->
+class Archiver:
+    """Run the archival every ARCHIVE_INTERVAL seconds in a daemon thread of each worker process.
+
+    Concurrent runs in several workers are safe, each batch is one write transaction.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._pid = None
+        self.last_run = None
+
+    def start(self):
+        # Started by the first request of a worker (threads don't survive gunicorn's fork)
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='archiver', daemon=True).start()
+
+    def _run(self):
+        config = self.app.config
+        while True:
+            time.sleep(config['ARCHIVE_INTERVAL'])
+            with self.app.app_context():
+                try:
+                    moved = run(config['ARCHIVE_AFTER_DAYS'], config['ARCHIVE_BATCH'])
+                    self.last_run = (datetime.now(), moved)
+                    if moved:
+                        logger.info('Archived %d released booking(s)', moved)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Archiving released bookings failed')
+                finally:
+                    db.session.remove()
+
+def init_archive(app):
+    # ARCHIVE_INTERVAL=0 leaves archiving to `flask archive-bookings` (cron)
+    if not app.config['ARCHIVE_INTERVAL']:
+        return
+    archiver = app.extensions['archiver'] = Archiver(app)
+    app.before_request(archiver.start)
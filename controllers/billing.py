@@ -0,0 +1,102 @@
+import calendar
+from collections import defaultdict
+from datetime import datetime, timezone
+from math import ceil
+from sqlalchemy import select, func, cast, Integer
+from models.models import db, ParkingSpot, ParkingLot, ReserveParkingLot, ArchivedReservation
+from controllers import rollups
+
+# NumPy is optional, batch rating falls back to plain Python without it.
+# It is imported on first use, so it doesn't slow down the start of every worker.
+_numpy = False
+
+def numpy():
+    """Return the numpy module, or None when it is not installed."""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy as np
+            _numpy = np
+        except ImportError:
+            _numpy = None
+    return _numpy
+
+CHUNK_SIZE = 10000
+
+# <--------------------Charge a Single Booking-------------------->
+def charge(in_time, out_time, price):
+    """Return (hours, total_cost) for one booking, every started hour is billed."""
+    hours = ceil((out_time - in_time).total_seconds() / 3600)  # Convert to hours and round up
+    return hours, price * hours
+
+# <--------------------Charge Many Bookings at Once-------------------->
+def charges(durations, prices):
+    """Vectorized charge() on parked durations in seconds: return (hours, total_costs) lists."""
+    np = numpy()
+    if np is None:
+        hours = [ceil(seconds / 3600) for seconds in durations]
+        return hours, [price * booking_hours for price, booking_hours in zip(prices, hours)]
+    hours = np.ceil(np.asarray(durations, dtype=np.float64) / 3600).astype(np.int64)
+    return hours.tolist(), (np.asarray(prices, dtype=np.float64) * hours).tolist()
+
+def epoch(column):
+    # Seconds since epoch computed by SQLite, avoids parsing every datetime in Python
+    return cast(func.strftime('%s', column), Integer)
+
+# <--------------------Re-rate Bookings in Bulk-------------------->
+def rerate(lot_ids=None, price=None, released=True, as_of=None, chunk_size=CHUNK_SIZE):
+    """Recompute hours & total_cost for many bookings and write them back in bulk.
+
+    released=True re-rates completed bookings from their in/out time, optionally under a
+    new per hour `price` (the lot price otherwise). released=False writes the charges
+    accrued by open bookings up to `as_of` (now by default) without releasing them.
+    Bookings are read in id ranges of chunk_size (keyset), so memory stays bounded.
+    Returns the number of bookings updated.
+    """
+    as_of = as_of or datetime.now().replace(microsecond=0)
+    np = numpy()
+    updated = 0
+    lot_deltas, user_deltas = defaultdict(float), defaultdict(float)
+    # Released bookings may already be archived, open ones are always in ReserveParkingLot
+    for model in ((ReserveParkingLot, ArchivedReservation) if released else (ReserveParkingLot,)):
+        statement = select(model.id, epoch(model.in_time), epoch(model.out_time), ParkingLot.price,
+                           model.total_cost, model.user_id, ParkingSpot.lot_id)\
+            .join(ParkingSpot, ParkingSpot.id == model.spot_id)\
+            .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+            .where(model.is_release == released)
+        if lot_ids:
+            statement = statement.where(ParkingSpot.lot_id.in_(lot_ids))
+        last_id = 0
+        while True:
+            # Read a whole chunk first so the bulk update doesn't run under an open read cursor
+            rows = db.session.execute(statement.where(model.id > last_id).order_by(model.id).limit(chunk_size)).all()
+            if not rows:
+                break
+            ids, in_times, out_times, prices, old_costs, user_ids, spot_lot_ids = zip(*rows)
+            last_id = ids[-1]
+            if not released:
+                out_times = [calendar.timegm(as_of.timetuple())] * len(ids)
+            if price is not None:
+                prices = [price] * len(ids)
+            if np is None:
+                durations = [out_time - in_time for in_time, out_time in zip(in_times, out_times)]
+            else:
+                durations = np.asarray(out_times, dtype=np.int64) - np.asarray(in_times, dtype=np.int64)
+            hours, total_costs = charges(durations, prices)
+            # One executemany UPDATE by primary key for the whole chunk, straight to the driver
+            db.session.connection().exec_driver_sql(
+                f'UPDATE {model.__table__.name} SET hours = ?, total_cost = ? WHERE id = ?',
+                list(zip(hours, total_costs, ids))
+            )
+            updated += len(ids)
+            # Dashboard rollups only count the earnings of completed bookings
+            if released:
+                for in_time, out_time, old_cost, cost, user_id, lot_id in zip(in_times, out_times, old_costs, total_costs, user_ids, spot_lot_ids):
+                    if cost != (old_cost or 0):
+                        in_time = datetime.fromtimestamp(in_time, timezone.utc).replace(tzinfo=None)
+                        out_time = datetime.fromtimestamp(out_time, timezone.utc).replace(tzinfo=None)
+                        lot_deltas[(lot_id, out_time.year, out_time.month)] += cost - (old_cost or 0)
+                        user_deltas[(user_id, in_time.year, in_time.month)] += cost - (old_cost or 0)
+    rollups.record_rerate(lot_deltas, user_deltas)
+    db.session.commit()
+    return updated
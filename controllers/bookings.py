@@ -0,0 +1,142 @@
+import calendar
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import update, select
+from sqlalchemy.exc import IntegrityError
+from models.models import db, ParkingLot, ParkingSpot, ReserveParkingLot
+from controllers.allocator import allocator
+from controllers.plates import open_plates, normalize
+from controllers import occupancy, rollups, billing, events, eventlog
+
+# Booking & release shared by the HTML routes and the JSON API
+
+class VehicleAlreadyParked(Exception):
+    """The vehicle already has an open booking."""
+
+# <--------------------Book a Spot-------------------->
+def book(user_id, lot_id, vehicle_number, in_time=None, spot_number=None):
+    """Reserve a spot in the lot and commit.
+
+    The requested spot_number is tried first, otherwise the lowest free spot is used.
+    Returns the new ReserveParkingLot, or None when the lot is full. Raises
+    VehicleAlreadyParked if the vehicle has an open booking. Any error rolls the
+    transaction back and returns the claimed spot to the allocator before it is raised.
+    """
+    in_time = in_time or datetime.now().replace(microsecond=0)
+    plate = normalize(vehicle_number)
+    if open_plates.open_booking(plate):
+        raise VehicleAlreadyParked(vehicle_number)
+    claimed = None
+    try:
+        # Claim the spot atomically (falls back to the next free spot if it was taken meanwhile)
+        claimed = allocator.claim(lot_id, spot_number)
+        if not claimed:
+            return None
+        spot_id, spot_number = claimed
+        reservation = ReserveParkingLot(user_id=user_id, spot_id=spot_id, in_time=in_time, vehicle_number=vehicle_number, plate=plate)
+        db.session.add(reservation)
+        occupancy.adjust(lot_id, 1)
+        rollups.record_booking(lot_id, user_id, in_time)
+        db.session.commit()
+    # Rollback the changes if process failed in middle
+    except Exception as e:
+        db.session.rollback()
+        # Claimed spot is free again after rollback, return it to the allocator
+        if claimed:
+            allocator.release(lot_id, *claimed)
+        # Same vehicle booked at the same time on another gate (ux_reserve_open_plate)
+        if isinstance(e, IntegrityError) and 'plate' in str(e.orig):
+            raise VehicleAlreadyParked(vehicle_number) from e
+        raise
+    open_plates.add(plate, reservation.id)
+    eventlog.booked(reservation, lot_id)
+    events.publish_spot(lot_id, spot_id, reservation)
+    events.publish_lots([lot_id])
+    return reservation
+
+# <--------------------Release a Spot-------------------->
+def release(booking):
+    """End the booking now, charge it on the server and commit.
+
+    Returns the booking, or None when it was already released (by another gate or tab).
+    """
+    # Charges are computed on the server, hours & total_cost sent by the client are not trusted
+    out_time = datetime.now().replace(microsecond=0)
+    lot_id = booking.parking_spot.lot_id
+    # A spot deleted while it was occupied (before delete_spot checked it) no longer counts in the lot
+    counted = not booking.parking_spot.deleted_spot
+    hours, total_cost = billing.charge(booking.in_time, out_time, booking.parking_spot.parking_lot.price)
+    # Only one concurrent release of the same booking may win
+    result = db.session.execute(
+        update(ReserveParkingLot)
+        .where(ReserveParkingLot.id == booking.id, ReserveParkingLot.is_release == False)
+        .values(is_release=True, out_time=out_time, hours=hours, total_cost=total_cost)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return None
+    booking.parking_spot.occupied = False
+    if counted:
+        occupancy.adjust(lot_id, -1)
+    rollups.record_release(lot_id, booking.user_id, booking.in_time, out_time, total_cost)
+    db.session.commit()
+    # Spot is free again, return it to the allocator
+    if counted:
+        allocator.release(lot_id, booking.spot_id, booking.parking_spot.spot_number)
+    open_plates.remove(booking.plate, booking.id)
+    eventlog.released([(lot_id, booking.spot_id, booking.id, booking.user_id, counted)])
+    if counted:
+        events.publish_spot(lot_id, booking.spot_id)
+    events.publish_lots([lot_id])
+    return booking
+
+# <--------------------Settle Open Bookings in Bulk-------------------->
+def settle(lot_ids):
+    """Release & charge every open booking of the lots in one transaction, return how many were settled.
+
+    Used when a lot closes or at the end of the day, with the same billing as release().
+    """
+    out_time = datetime.now().replace(microsecond=0)
+    # Free the spots of the open bookings with one set-based UPDATE (also takes the SQLite write lock first)
+    db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.lot_id.in_(lot_ids),
+               ParkingSpot.id.in_(select(ReserveParkingLot.spot_id).where(ReserveParkingLot.is_release == False)))
+        .values(occupied=False)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.session.execute(
+        select(ReserveParkingLot.id, ReserveParkingLot.user_id, ReserveParkingLot.in_time, billing.epoch(ReserveParkingLot.in_time),
+               ReserveParkingLot.plate, ReserveParkingLot.spot_id, ParkingSpot.lot_id, ParkingLot.price, ParkingSpot.deleted_spot)
+        .join(ParkingSpot, ParkingSpot.id == ReserveParkingLot.spot_id)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .where(ParkingSpot.lot_id.in_(lot_ids), ReserveParkingLot.is_release == False)
+    ).all()
+    if not rows:
+        db.session.commit()
+        return 0
+    ids, user_ids, in_times, in_epochs, plates, spot_ids, spot_lot_ids, prices, deleted_spots = zip(*rows)
+    # Spots deleted while occupied no longer count in their lot, see release()
+    counted = [not deleted for deleted in deleted_spots]
+    out_epoch = calendar.timegm(out_time.timetuple())
+    hours, total_costs = billing.charges([out_epoch - in_epoch for in_epoch in in_epochs], prices)
+    # One executemany UPDATE by primary key, out_time in the same format SQLAlchemy writes
+    db.session.connection().exec_driver_sql(
+        'UPDATE reserve_parking_lot SET is_release = 1, out_time = ?, hours = ?, total_cost = ? WHERE id = ? AND is_release = 0',
+        [(out_time.strftime('%Y-%m-%d %H:%M:%S.%f'), booking_hours, cost, booking_id)
+         for booking_hours, cost, booking_id in zip(hours, total_costs, ids)]
+    )
+    for lot_id, count in Counter(lot_id for lot_id, spot_counted in zip(spot_lot_ids, counted) if spot_counted).items():
+        occupancy.adjust(lot_id, -count)
+    rollups.record_releases([(lot_id, user_id, in_time, out_time, cost)
+                             for lot_id, user_id, in_time, cost in zip(spot_lot_ids, user_ids, in_times, total_costs)])
+    db.session.commit()
+    # Spots are free again, rebuild the lots' free spot heaps on next use
+    for lot_id in set(lot_ids):
+        allocator.invalidate(lot_id)
+    for plate, booking_id in zip(plates, ids):
+        open_plates.remove(plate, booking_id)
+    eventlog.released(list(zip(spot_lot_ids, spot_ids, ids, user_ids, counted)))
+    events.publish_freed_spots([(lot_id, spot_id) for lot_id, spot_id, spot_counted in zip(spot_lot_ids, spot_ids, counted) if spot_counted])
+    events.publish_lots(set(lot_ids))
+    return len(ids)
@@ -0,0 +1,202 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from models.models import db, User, ParkingLot, ParkingSpot
+
+# redis is optional, it is only needed when CACHE_REDIS_URL is configured
+try:
+    import redis
+except ImportError:
+    redis = None
+
+class LRUCache:
+    """Small thread-safe LRU cache with a per-entry time to live and hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (expires_at, value), oldest used first
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            # Evict least recently used entries beyond maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+def snapshot(row, exclude=()):
+    # Plain copy of an ORM row's columns, safe to share between requests and workers
+    return SimpleNamespace(**{column.name: getattr(row, column.name) for column in row.__table__.columns if column.name not in exclude})
+
+# <--------------------Current User Cache-------------------->
+user_cache = LRUCache(maxsize=4096, ttl=300)
+
+def get_user(user_id):
+    """Return a read-only snapshot of the user row (not an ORM object), or None if it does not exist.
+
+    Snapshots are shared between requests, so handlers that change the user must load
+    the ORM object themselves and call invalidate_user() after committing.
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.get(User, user_id)
+        if row is None:
+            return None
+        user = snapshot(row)
+        user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id):
+    user_cache.delete(user_id)
+
+# <--------------------Cache Backends-------------------->
+class DictBackend:
+    """In-process backend: bounded LRU entries plus version counters, one copy per worker."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.entries = LRUCache(maxsize, ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries.set(key, value)
+
+    def version(self, name):
+        return self._versions.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+class RedisBackend:
+    """Shared backend for multi-worker deployments on any Redis-compatible server.
+    Size is bounded by the server's maxmemory eviction policy and the entry TTL."""
+
+    def __init__(self, url, ttl=300, prefix='parkeasy:'):
+        if redis is None:
+            raise RuntimeError('CACHE_REDIS_URL is set but the redis package is not installed, install it with `pip install redis`')
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def version(self, name):
+        return int(self.client.get(self.prefix + 'version:' + name) or 0)
+
+    def bump(self, name):
+        self.client.incr(self.prefix + 'version:' + name)
+
+# <--------------------Versioned Read-Through Cache-------------------->
+class VersionedCache:
+    """Read-through cache where every entry is stored with the version it was loaded at.
+
+    Writers bump the version instead of deleting entries, so a reader that loaded data
+    just before a write can never store it as current: its entry carries the old version
+    and is treated as a miss by the next reader.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # Only guards the counters, loaders run outside it
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        # Read the version before loading, see class docstring
+        version = self.backend.version(key)
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+        with self._lock:
+            self.misses += 1
+        value = loader()
+        self.backend.set(key, (version, value))
+        return value
+
+    def invalidate(self, key):
+        self.backend.bump(key)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'backend': type(self.backend).__name__}
+
+lot_cache = VersionedCache(DictBackend(maxsize=1024, ttl=300))
+
+def init_cache(app):
+    """Use the shared Redis-compatible backend when CACHE_REDIS_URL is configured.
+
+    Without it every worker has its own copy and only sees its own invalidations, so the
+    entries expire after CACHE_LOCAL_TTL seconds to bound how stale other workers get.
+    """
+    global lot_cache
+    if app.config.get('CACHE_REDIS_URL'):
+        lot_cache = VersionedCache(RedisBackend(app.config['CACHE_REDIS_URL']))
+    else:
+        lot_cache = VersionedCache(DictBackend(maxsize=1024, ttl=app.config['CACHE_LOCAL_TTL']))
+
+# <--------------------Lot Metadata & Spot Maps-------------------->
+def get_lots():
+    """Snapshots of every active lot, for the home page without a search."""
+    return lot_cache.get('lots', lambda: [snapshot(lot) for lot in ParkingLot.query.filter_by(deleted_lot=False).order_by(ParkingLot.id).all()])
+
+def get_lot(lot_id):
+    return lot_cache.get(f'lot:{lot_id}', lambda: snapshot(lot) if (lot := db.session.get(ParkingLot, lot_id)) else None)
+
+def get_spots(lot_id):
+    """Snapshots of the lot's active spots (exclude soft deleted spots).
+
+    Occupancy changes with every booking, it is left out of the snapshot and read live by the caller.
+    """
+    return lot_cache.get(f'spots:{lot_id}', lambda: [snapshot(spot, exclude=('occupied',))
+                                                     for spot in ParkingSpot.query.filter_by(lot_id=lot_id, deleted_spot=False).all()])
+
+def invalidate_lot(lot_id):
+    # Lot details changed (also changes the home page lot list)
+    lot_cache.invalidate(f'lot:{lot_id}')
+    lot_cache.invalidate('lots')
+
+def invalidate_spots(lot_id):
+    # Spot added or removed
+    lot_cache.invalidate(f'spots:{lot_id}')
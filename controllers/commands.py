@@ -0,0 +1,148 @@
+import time
+import click
+from controllers import occupancy, rollups, export, billing, bookings, synthetic, eventlog, archive
+from models.models import db, ParkingLot
+from models import migrations
+
+def init_commands(app):
+    # <--------------------Create Schema & Admin User-------------------->
+    @app.cli.command('init-db')
+    def init_db():
+        """Create the tables, apply migrations & create the admin user (ADMIN_PASSWORD, default 'admin')."""
+        applied, admin_created = migrations.bootstrap()
+        for version, description in applied:
+            click.echo(f"Applied migration {version}: {description}")
+        click.echo(f"Database at schema version {migrations.current_version()}")
+        if admin_created:
+            click.echo("Created admin user 'admin'")
+
+    # <--------------------Apply Schema Migrations-------------------->
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Apply pending schema migrations to the configured database."""
+        applied = migrations.upgrade()
+        for version, description in applied:
+            click.echo(f"Applied migration {version}: {description}")
+        click.echo(f"Database at schema version {migrations.current_version()}")
+
+    # <--------------------Rebuild Lot Occupancy Counters-------------------->
+    @app.cli.command('reconcile-occupancy')
+    def reconcile_occupancy():
+        """Rebuild lot occupancy counters from ParkingSpot and report any drift."""
+        drift = occupancy.reconcile()
+        for lot_id, stored, actual in drift:
+            click.echo(f"Lot {lot_id}: stored (occupied, available) = {stored}, actual = {actual}")
+        click.echo(f"{len(drift)} lot(s) out of sync, counters rebuilt")
+
+    # <--------------------Replay the Reservation Event Log-------------------->
+    @app.cli.command('events-replay')
+    def events_replay():
+        """Compare lot occupancy counters with the event log snapshot & events and report any drift."""
+        drift = eventlog.replay()
+        for lot_id, stored, replayed in drift:
+            click.echo(f"Lot {lot_id}: stored (occupied, available) = {stored}, replayed = {replayed}")
+        click.echo(f"{len(drift)} lot(s) out of sync" + (', rebuild the counters with `flask reconcile-occupancy`' if drift else ''))
+
+    # <--------------------Compact the Reservation Event Log-------------------->
+    @app.cli.command('events-compact')
+    @click.option('--keep-days', type=click.IntRange(min=0), default=90, help='Keep the events of this many days')
+    @click.option('--batch-size', type=click.IntRange(min=1), default=50000, help='Events folded & deleted per transaction')
+    def events_compact(keep_days, batch_size):
+        """Fold old events into the occupancy snapshot and delete them."""
+        start = time.perf_counter()
+        deleted = eventlog.compact(keep_days, batch_size)
+        click.echo(f"Compacted {deleted} event(s) older than {keep_days} day(s) in {time.perf_counter() - start:.1f}s")
+
+    # <--------------------Archive Old Released Bookings-------------------->
+    @app.cli.command('archive-bookings')
+    @click.option('--after-days', type=click.IntRange(min=0), help='Released more than this many days ago (default: ARCHIVE_AFTER_DAYS)')
+    @click.option('--batch-size', type=click.IntRange(min=1), help='Bookings moved per transaction (default: ARCHIVE_BATCH)')
+    @click.option('--pause', type=click.FloatRange(min=0), default=0.1, help='Seconds between batches')
+    def archive_bookings(after_days, batch_size, pause):
+        """Move old released bookings from ReserveParkingLot to the archive table in batches."""
+        after_days = app.config['ARCHIVE_AFTER_DAYS'] if after_days is None else after_days
+        start = time.perf_counter()
+        moved = archive.run(after_days, batch_size or app.config['ARCHIVE_BATCH'], pause)
+        elapsed = time.perf_counter() - start
+        click.echo(f"Archived {moved} booking(s) released more than {after_days} day(s) ago in {elapsed:.1f}s")
+
+    # <--------------------Rebuild Dashboard Rollups-------------------->
+    @app.cli.command('backfill-rollups')
+    def backfill_rollups():
+        """Rebuild the lot & user monthly rollup tables from the booking history."""
+        rows = rollups.backfill()
+        click.echo(f"{rows} rollup row(s) rebuilt")
+
+    # <--------------------Export Reservations-------------------->
+    @app.cli.command('export-reservations')
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'parquet', 'arrow']), default='csv')
+    @click.option('--start', help='First in_time date (YYYY-MM-DD)')
+    @click.option('--end', help='Last in_time date (YYYY-MM-DD), inclusive')
+    @click.option('--lot-id', 'lot_ids', type=int, multiple=True, help='Only these lots (repeatable)')
+    @click.option('--gzip', 'compress', is_flag=True, help='Gzip the output')
+    @click.option('--output', '-o', type=click.Path(dir_okay=False), help='Output file (default: generated name)')
+    def export_reservations(file_format, start, end, lot_ids, compress, output):
+        """Stream reservations joined with lot & user to a CSV, Parquet or Arrow file."""
+        try:
+            chunks = export.export(file_format, export.parse_date(start), export.parse_date(end), list(lot_ids), compress)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        output = output or export.filename(file_format, compress)
+        size = 0
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                file.write(data)
+                size += len(data)
+        click.echo(f"Exported reservations to {output} ({size} bytes)")
+
+    # <--------------------Re-rate Bookings-------------------->
+    @app.cli.command('rerate')
+    @click.option('--lot-id', 'lot_ids', type=int, multiple=True, help='Only these lots (repeatable)')
+    @click.option('--price', type=float, help='New price per hour (default: current lot price)')
+    @click.option('--open', 'open_bookings', is_flag=True, help='Write accrued charges of open bookings instead')
+    def rerate(lot_ids, price, open_bookings):
+        """Recompute hours & total_cost of bookings in bulk."""
+        updated = billing.rerate(list(lot_ids), price, released=not open_bookings)
+        click.echo(f"{updated} booking(s) re-rated")
+
+    # <--------------------Settle Open Bookings-------------------->
+    @app.cli.command('settle')
+    @click.option('--lot-id', 'lot_ids', type=int, multiple=True, help='Lots to settle (repeatable)')
+    @click.option('--all', 'all_lots', is_flag=True, help='Settle every active lot')
+    def settle(lot_ids, all_lots):
+        """Release & charge every open booking of the lots in one transaction."""
+        if all_lots:
+            lot_ids = [lot_id for (lot_id,) in db.session.query(ParkingLot.id).filter_by(deleted_lot=False)]
+        if not lot_ids:
+            raise click.UsageError('Give --lot-id (repeatable) or --all')
+        start = time.perf_counter()
+        settled = bookings.settle(list(lot_ids))
+        elapsed = time.perf_counter() - start
+        click.echo(f"Settled {settled} booking(s) in {elapsed:.2f}s ({settled / elapsed:.0f} bookings/sec)")
+
+    # <--------------------Generate Synthetic Data-------------------->
+    @app.cli.command('generate-data')
+    @click.option('--users', type=click.IntRange(min=1), default=10000)
+    @click.option('--lots', type=click.IntRange(min=1), default=100)
+    @click.option('--spots-per-lot', type=click.IntRange(min=1), default=100, help='Average, lots get 50-150%% of it')
+    @click.option('--reservations', type=click.IntRange(min=0), default=100000, help='Released bookings')
+    @click.option('--days', type=click.IntRange(min=1), default=365, help='History spread over this many days')
+    @click.option('--open-share', type=click.FloatRange(0, 1), default=0.3, help='Share of the new spots with an open booking')
+    @click.option('--seed', type=int, default=42)
+    @click.option('--as-of', type=click.DateTime(['%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S']), help='End of the history (default: current hour), fix it for identical runs')
+    @click.option('--password', default='password', help='Password of every generated user')
+    @click.option('--batch-size', type=click.IntRange(min=1), default=50000)
+    def generate_data(users, lots, spots_per_lot, reservations, days, open_share, seed, as_of, password, batch_size):
+        """Append deterministic synthetic users, lots, spots & bookings for scale testing."""
+        start = time.perf_counter()
+        written = synthetic.generate(users, lots, spots_per_lot, reservations, seed=seed, days=days, open_share=open_share,
+                                     password=password, as_of=as_of, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        for table, rows in written.items():
+            click.echo(f"{table}: {rows} row(s)")
+        total = sum(written.values())
+        click.echo(f"Generated {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/sec)")
+        start = time.perf_counter()
+        synthetic.rebuild()
+        click.echo(f"Rebuilt occupancy counters & dashboard rollups in {time.perf_counter() - start:.1f}s")
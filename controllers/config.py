@@ -1,11 +1,82 @@
 from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+import sqlite3
 import os
 
-def config_app(app):
-    """Configure the Flask application with environment variables."""
+def config_app(app, config=None):
+    """Configure the Flask application with environment variables, then with the `config` mapping."""
     # Load environment variables from .env file
     load_dotenv()
 
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS')
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
\ No newline at end of file
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
+    # Optional Redis-compatible server shared by all workers for the lot cache (in-process cache when unset)
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
+    # Seconds an in-process lot cache entry lives, bounds how long other workers show an old lot
+    app.config['CACHE_LOCAL_TTL'] = int(os.getenv('CACHE_LOCAL_TTL', 5))
+    # Keys of gate kiosks & cameras allowed to call the JSON API (comma separated)
+    app.config['API_KEYS'] = [key.strip() for key in os.getenv('API_KEYS', '').split(',') if key.strip()]
+    # Create tables, migrate & seed the admin user when the app is built (off, use `flask init-db`)
+    app.config['AUTO_BOOTSTRAP'] = os.getenv('AUTO_BOOTSTRAP', 'False').lower() in ('1', 'true')
+    # Requests running more SQL statements than this are logged (N+1 patterns)
+    app.config['SQL_QUERY_THRESHOLD'] = int(os.getenv('SQL_QUERY_THRESHOLD', 25))
+    # Password hashing: werkzeug method & parameters (older hashes are upgraded at login), hashing
+    # processes per worker, hashes running or queued at once & seconds to wait for a free slot
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_WORKERS'] = int(os.getenv('PASSWORD_WORKERS', 1))
+    app.config['PASSWORD_CONCURRENCY'] = int(os.getenv('PASSWORD_CONCURRENCY', 4))
+    app.config['PASSWORD_QUEUE_TIMEOUT'] = float(os.getenv('PASSWORD_QUEUE_TIMEOUT', 10))
+    # Lock a username out for LOGIN_FAILURE_WINDOW seconds after LOGIN_MAX_FAILURES failed logins
+    app.config['LOGIN_MAX_FAILURES'] = int(os.getenv('LOGIN_MAX_FAILURES', 5))
+    app.config['LOGIN_FAILURE_WINDOW'] = int(os.getenv('LOGIN_FAILURE_WINDOW', 300))
+    # Reservation event log group commits: events per write transaction & seconds an event may wait for its batch
+    app.config['EVENT_LOG_BATCH'] = int(os.getenv('EVENT_LOG_BATCH', 500))
+    app.config['EVENT_LOG_INTERVAL'] = float(os.getenv('EVENT_LOG_INTERVAL', 0.05))
+    # Move bookings released more than ARCHIVE_AFTER_DAYS ago to the archive table, ARCHIVE_BATCH rows per
+    # transaction, every ARCHIVE_INTERVAL seconds in each worker (0 = only with `flask archive-bookings`)
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+    app.config['ARCHIVE_BATCH'] = int(os.getenv('ARCHIVE_BATCH', 5000))
+    app.config['ARCHIVE_INTERVAL'] = int(os.getenv('ARCHIVE_INTERVAL', 0))
+    # Live screens (SSE): streams per worker (each holds a thread, default half of WEB_THREADS), seconds
+    # before a stream is closed & milliseconds the browser waits to reconnect (or retry when the worker is full)
+    app.config['STREAM_MAX_CLIENTS'] = int(os.getenv('STREAM_MAX_CLIENTS', max(1, int(os.getenv('WEB_THREADS', 8)) // 2)))
+    app.config['STREAM_LIFETIME'] = int(os.getenv('STREAM_LIFETIME', 300))
+    app.config['STREAM_RETRY'] = int(os.getenv('STREAM_RETRY', 15000))
+    if config:
+        app.config.from_mapping(config)
+    # Pool options follow the final database URI
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+# <--------------------Connection Pool-------------------->
+def engine_options(database_uri):
+    """Pool settings for a multi-worker, multi-threaded server, tunable with environment variables."""
+    options = {
+        # Check connections before use & replace the ones older than pool_recycle seconds
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True').lower() in ('1', 'true'),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    url = make_url(database_uri) if database_uri else None
+    # In-memory SQLite keeps a single connection per thread, it has no pool to size
+    if url is None or url.get_backend_name() != 'sqlite' or url.database not in (None, '', ':memory:'):
+        # pool_size should cover the threads of one worker, overflow absorbs short bursts
+        options['pool_size'] = int(os.getenv('DB_POOL_SIZE', 10))
+        options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+        options['pool_timeout'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    return options
+
+# <--------------------SQLite Pragmas-------------------->
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent readers & writers."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run while one writer commits (persistent, stored in the database file)
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # Wait for the write lock instead of failing with "database is locked"
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT', 30000))}")
+    # Safe with WAL, fsync on checkpoints only instead of on every commit
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
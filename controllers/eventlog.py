@@ -0,0 +1,206 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, insert, delete
+from sqlalchemy.dialects.sqlite import insert as upsert
+from models.models import db, ParkingLot, LotOccupancy, ReservationEvent, OccupancySnapshot
+from controllers import occupancy
+
+# Append-only reservation event log. The routes append an event after they commit, a writer thread
+# per worker process inserts whatever queued up meanwhile with one executemany & one commit
+# (group commit), so many bookings share a single write transaction on the event table.
+
+logger = logging.getLogger(__name__)
+
+BOOKED, RELEASED, SPOT_DELETED, LOT_RESIZED = 'booked', 'released', 'spot_deleted', 'lot_resized'
+COLUMNS = ('kind', 'lot_id', 'spot_id', 'booking_id', 'user_id', 'occupied_delta', 'spots_delta', 'created_at')
+
+class EventLog:
+    """Buffer events in memory and write them in batches from a background thread.
+
+    A batch is written when `batch_size` events are queued or `interval` seconds after its
+    first event, whichever comes first. Appending never touches the database. Events still
+    queued when the process is killed are lost (at most `interval` seconds worth), a clean
+    exit flushes them.
+    """
+
+    def __init__(self, app, batch_size=500, interval=0.05):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._written = threading.Condition()
+        self._pid = None
+        self.appended = self.committed = self.batches = 0
+
+    # <--------------------Writer Thread (per worker process)-------------------->
+    def _start(self):
+        # Threads don't survive a fork, the first append in a new process starts its own writer
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self.appended = self.committed = self.batches = 0
+            threading.Thread(target=self._run, name='event-log-writer', daemon=True).start()
+            if self._pid is None:
+                atexit.register(self.flush, 5)
+            self._pid = os.getpid()
+
+    def _run(self):
+        with self.app.app_context():
+            engine = db.engine
+        while True:
+            # Wait for the first event, then gather more until the batch is full or the interval is over
+            batch = list(self._queue.get())
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch += self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._write(engine, batch)
+
+    def _write(self, engine, batch):
+        # Keep retrying, the events are the audit trail & must not be dropped on a locked database
+        while True:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(ReservationEvent), [dict(zip(COLUMNS, event)) for event in batch])
+                break
+            except Exception:
+                logger.exception('Writing %d reservation events failed, retrying', len(batch))
+                time.sleep(1)
+        with self._written:
+            self.committed += len(batch)
+            self.batches += 1
+            self._written.notify_all()
+
+    # <--------------------Append & Flush-------------------->
+    def append(self, events):
+        """Queue (kind, lot_id, spot_id, booking_id, user_id, occupied_delta, spots_delta) tuples, call after commit."""
+        if not events:
+            return
+        self._start()
+        created_at = datetime.now()
+        with self._written:
+            self.appended += len(events)
+        self._queue.put([(*event, created_at) for event in events])
+
+    def flush(self, timeout=None):
+        """Wait until every event appended so far in this process is committed, return False on timeout."""
+        if self._pid != os.getpid():
+            return True
+        with self._written:
+            return self._written.wait_for(lambda: self.committed >= self.appended, timeout)
+
+    def stats(self):
+        with self._written:
+            return {'appended': self.appended, 'committed': self.committed, 'batches': self.batches}
+
+def log():
+    return current_app.extensions['event_log']
+
+def init_event_log(app):
+    app.extensions['event_log'] = EventLog(app, app.config['EVENT_LOG_BATCH'], app.config['EVENT_LOG_INTERVAL'])
+
+# <--------------------Events of the Routes-------------------->
+def booked(reservation, lot_id):
+    log().append([(BOOKED, lot_id, reservation.spot_id, reservation.id, reservation.user_id, 1, 0)])
+
+def released(bookings):
+    """bookings is a list of (lot_id, spot_id, booking_id, user_id, counted), counted is False for a
+    deleted spot, its release is logged without changing the lot's occupied count."""
+    log().append([(RELEASED, lot_id, spot_id, booking_id, user_id, -int(counted), 0)
+                  for lot_id, spot_id, booking_id, user_id, counted in bookings])
+
+def spot_deleted(lot_id, spot_id):
+    # Only free spots are deleted, the lot loses an available spot
+    log().append([(SPOT_DELETED, lot_id, spot_id, None, None, 0, -1)])
+
+def lot_resized(lot_id, spots_delta):
+    # Lot created (+spots), resized or deleted (-spots)
+    if spots_delta:
+        log().append([(LOT_RESIZED, lot_id, None, None, None, 0, spots_delta)])
+
+# <--------------------Occupancy Projection-------------------->
+def project():
+    """Return {lot_id: (occupied, available)} replayed from the snapshot & the events after it."""
+    state = {row.lot_id: [row.occupied, row.spots, row.last_event_id] for row in OccupancySnapshot.query.all()}
+    # Per-lot sums of the events newer than the lot's snapshot (all of them for lots without one)
+    deltas = db.session.query(
+        ReservationEvent.lot_id, func.sum(ReservationEvent.occupied_delta), func.sum(ReservationEvent.spots_delta)
+    ).outerjoin(OccupancySnapshot, OccupancySnapshot.lot_id == ReservationEvent.lot_id)\
+     .filter(ReservationEvent.id > func.coalesce(OccupancySnapshot.last_event_id, 0))\
+     .group_by(ReservationEvent.lot_id)
+    for lot_id, occupied, spots in deltas:
+        counts = state.setdefault(lot_id, [0, 0, 0])
+        counts[0] += occupied
+        counts[1] += spots
+    return {lot_id: (occupied, spots - occupied) for lot_id, (occupied, spots, _) in state.items()}
+
+def replay():
+    """Compare LotOccupancy with the event log and return the drift found as a list of
+    (lot_id, stored (occupied, available), replayed (occupied, available)).
+
+    Only reports, the counters are never overwritten from the log: events are written after
+    the commit, so a killed worker loses its queued ones. Wait for the writers of the other
+    processes (EVENT_LOG_INTERVAL) before trusting a drift reported on a busy server, and
+    repair the counters from ParkingSpot with occupancy.reconcile().
+    """
+    log().flush()
+    projected = project()
+    stored = {row.lot_id: (row.occupied, row.available) for row in LotOccupancy.query.all()}
+    drift = []
+    for (lot_id,) in db.session.query(ParkingLot.id).all():
+        counts = projected.get(lot_id, (0, 0))
+        if stored.get(lot_id) != counts:
+            drift.append((lot_id, stored.get(lot_id), counts))
+    return drift
+
+# <--------------------Compaction-------------------->
+def compact(keep_days, batch_size=50000):
+    """Fold the events older than keep_days into the snapshot and delete them, return the deleted count.
+
+    Works through the old events in id ranges of batch_size with a commit each, so the event
+    writers never wait long for the write lock.
+    """
+    log().flush()
+    first, cutoff = db.session.query(func.min(ReservationEvent.id), func.max(ReservationEvent.id))\
+        .filter(ReservationEvent.created_at < datetime.now() - timedelta(days=keep_days)).one()
+    deleted = 0
+    statement = upsert(OccupancySnapshot)
+    statement = statement.on_conflict_do_update(
+        index_elements=['lot_id'],
+        set_={'occupied': OccupancySnapshot.occupied + statement.excluded.occupied,
+              'spots': OccupancySnapshot.spots + statement.excluded.spots,
+              'last_event_id': statement.excluded.last_event_id}
+    )
+    for lower in range(first or 1, (cutoff or 0) + 1, batch_size):
+        upper = min(cutoff, lower + batch_size - 1)
+        folded = db.session.query(
+            ReservationEvent.lot_id, func.sum(ReservationEvent.occupied_delta), func.sum(ReservationEvent.spots_delta)
+        ).outerjoin(OccupancySnapshot, OccupancySnapshot.lot_id == ReservationEvent.lot_id)\
+         .filter(ReservationEvent.id <= upper, ReservationEvent.id > func.coalesce(OccupancySnapshot.last_event_id, 0))\
+         .group_by(ReservationEvent.lot_id).all()
+        if folded:
+            db.session.execute(statement, [{'lot_id': lot_id, 'occupied': occupied, 'spots': spots, 'last_event_id': upper}
+                                           for lot_id, occupied, spots in folded])
+        deleted += db.session.execute(delete(ReservationEvent).where(ReservationEvent.id <= upper)).rowcount
+        db.session.commit()
+    return deleted
+
+def baseline():
+    """Snapshot every lot from ParkingSpot as of the newest event, for rows written without events (generate-data)."""
+    log().flush()
+    last_event_id = db.session.query(func.max(ReservationEvent.id)).scalar() or 0
+    db.session.query(OccupancySnapshot).delete()
+    counts = occupancy.count_spots()
+    for (lot_id,) in db.session.query(ParkingLot.id).all():
+        occupied, available = counts.get(lot_id, (0, 0))
+        db.session.add(OccupancySnapshot(lot_id=lot_id, occupied=occupied, spots=occupied + available, last_event_id=last_event_id))
+    db.session.commit()
@@ -0,0 +1,136 @@
+import json
+import queue
+import threading
+import time
+from flask import current_app
+from models.models import db, User
+from controllers import occupancy, cache
+
+# Sent to a client whose queue overflowed, it gets a full snapshot instead of the lost events
+RESYNC = object()
+
+class OccupancyHub:
+    """In-process pub/sub of lot occupancy changes for the Server-Sent Events streams.
+
+    Every subscriber has a bounded queue. Publishing never blocks: when a slow client's
+    queue is full its pending events are dropped and replaced by RESYNC, and the client
+    is sent the current counters of every lot instead. Events are (name, data) tuples,
+    data is a dict with the lot_id.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, max_subscribers=None):
+        """Return a new subscriber queue, or None when max_subscribers are already connected."""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if max_subscribers is not None and len(self._subscribers) >= max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Back-pressure: drop the backlog of the slow client & make it resync
+                try:
+                    while True:
+                        subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                subscriber.put_nowait(RESYNC)
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'queued': sum(subscriber.qsize() for subscriber in self._subscribers)}
+
+hub = OccupancyHub()
+
+# <--------------------Publish After Commit-------------------->
+def publish_lots(lot_ids):
+    """Push the committed occupancy counters of the lots to every connected client."""
+    if not hub.stats()['subscribers']:
+        return
+    for lot_id, status in occupancy.lot_status(list(lot_ids)).items():
+        hub.publish(('occupancy', {'lot_id': lot_id, **status}))
+
+def publish_spot(lot_id, spot_id, reservation=None):
+    """Push a spot taken by reservation (freed when None) to the spot pages, before publish_lots()."""
+    if not hub.stats()['subscribers']:
+        return
+    spot = {'lot_id': lot_id, 'spot_id': spot_id, 'occupied': reservation is not None}
+    if reservation is not None:
+        spot.update(user_name=db.session.get(User, reservation.user_id).name, in_time=str(reservation.in_time),
+                    vehicle_number=reservation.vehicle_number)
+    hub.publish(('spot', spot))
+
+def publish_freed_spots(lot_spot_ids):
+    """publish_spot() of many freed spots: lot_spot_ids is a list of (lot_id, spot_id)."""
+    if not hub.stats()['subscribers']:
+        return
+    for lot_id, spot_id in lot_spot_ids:
+        hub.publish(('spot', {'lot_id': lot_id, 'spot_id': spot_id, 'occupied': False}))
+
+# <--------------------Server-Sent Events Stream-------------------->
+def _message(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def _snapshot(lot_ids):
+    # Current counters of the lots (every active lot when lot_ids is empty)
+    lot_ids = lot_ids or [lot.id for lot in cache.get_lots()]
+    messages = [_message('occupancy', {'lot_id': lot_id, **status}) for lot_id, status in sorted(occupancy.lot_status(lot_ids).items())]
+    # Don't keep a pooled connection while the stream waits for events
+    db.session.close()
+    return messages
+
+def stream(lot_ids=None, spots=False, keepalive=15, resync=60):
+    """Yield SSE messages: a snapshot of the lots, then every change as it is committed
+    (and every spot taken or freed with spots).
+
+    Needs the app context for the whole stream (wrap it with stream_with_context). Changes
+    committed by other workers are picked up by the full snapshot sent every `resync` seconds.
+    Every open stream holds a worker thread: a worker serves at most STREAM_MAX_CLIENTS streams
+    (the others get the snapshot only) and ends each after STREAM_LIFETIME seconds, the browser
+    reconnects STREAM_RETRY milliseconds after a stream ends.
+    """
+    config = current_app.config
+    retry = f"retry: {config['STREAM_RETRY']}\n\n"
+    lot_ids = set(lot_ids or [])
+    subscriber = hub.subscribe(config['STREAM_MAX_CLIENTS'])
+    if subscriber is None:
+        yield ''.join(_snapshot(lot_ids)) + retry
+        return
+    try:
+        yield ''.join(_snapshot(lot_ids))
+        last_sync = time.monotonic()
+        closes_at = last_sync + config['STREAM_LIFETIME']
+        while time.monotonic() < closes_at:
+            try:
+                event = subscriber.get(timeout=min(keepalive, max(0, closes_at - time.monotonic())))
+            except queue.Empty:
+                event = None
+            if event is RESYNC or time.monotonic() - last_sync >= resync:
+                yield ''.join(_snapshot(lot_ids))
+                last_sync = time.monotonic()
+            elif event is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+            else:
+                name, data = event
+                if (spots or name != 'spot') and (not lot_ids or data['lot_id'] in lot_ids):
+                    yield _message(name, data)
+        # Free the thread, the browser opens a new stream (and gets a fresh snapshot)
+        yield retry
+    finally:
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,133 @@
+import csv
+import heapq
+import io
+import zlib
+from datetime import datetime, timedelta
+from importlib.util import find_spec
+from itertools import islice
+from sqlalchemy import select
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveParkingLot, ArchivedReservation
+
+# pyarrow is optional, Parquet & Arrow export are only offered when it is installed.
+# It is slow to import, so it is only loaded by the first Parquet/Arrow export.
+HAS_PYARROW = find_spec('pyarrow') is not None
+pa = pq = None
+
+COLUMNS = ['booking_id', 'username', 'name', 'parking_name', 'city', 'pincode', 'spot_number', 'vehicle_number',
+           'in_time', 'out_time', 'hours', 'price', 'total_cost', 'is_release']
+CHUNK_SIZE = 10000
+
+def formats():
+    return ['csv', 'parquet', 'arrow'] if HAS_PYARROW else ['csv']
+
+# <--------------------Read Reservations in Chunks-------------------->
+def reservation_chunks(start=None, end=None, lot_ids=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of plain row tuples (no ORM objects) for reservations with in_time in [start, end]."""
+    # Recent & archived bookings, each table read in primary key order & merged by id
+    # (ids are unique across both tables), a union would be sorted before the first row.
+    # `+ 0` keeps SQLite from driving the joins through the user/spot indexes, which sorts too
+    results = []
+    for reservations in (ReserveParkingLot, ArchivedReservation):
+        statement = select(
+            reservations.id, User.username, User.name, ParkingLot.parking_name, ParkingLot.city, ParkingLot.pincode,
+            ParkingSpot.spot_number, reservations.vehicle_number, reservations.in_time, reservations.out_time,
+            reservations.hours, ParkingLot.price, reservations.total_cost, reservations.is_release
+        ).join(User, User.id == reservations.user_id + 0)\
+        .join(ParkingSpot, ParkingSpot.id == reservations.spot_id + 0)\
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+        .order_by(reservations.id)
+        if start:
+            statement = statement.where(reservations.in_time >= start)
+        if end:
+            # `end` date is inclusive
+            statement = statement.where(reservations.in_time < end + timedelta(days=1))
+        if lot_ids:
+            statement = statement.where(ParkingSpot.lot_id.in_(lot_ids))
+        # Server side cursor, rows are fetched chunk by chunk instead of all at once
+        results.append(db.session.execute(statement.execution_options(yield_per=chunk_size)))
+    rows = heapq.merge(*results, key=lambda row: row[0])
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+# <--------------------CSV-------------------->
+def csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+# <--------------------Parquet & Arrow (needs pyarrow)-------------------->
+class _Sink(io.RawIOBase):
+    # Write-only file object that hands out what pyarrow wrote since the last drain
+    def __init__(self):
+        self.parts = []
+    def writable(self):
+        return True
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+def _schema():
+    return pa.schema([
+        ('booking_id', pa.int64()), ('username', pa.string()), ('name', pa.string()), ('parking_name', pa.string()),
+        ('city', pa.string()), ('pincode', pa.string()), ('spot_number', pa.string()), ('vehicle_number', pa.string()),
+        ('in_time', pa.timestamp('s')), ('out_time', pa.timestamp('s')), ('hours', pa.int64()), ('price', pa.float64()),
+        ('total_cost', pa.float64()), ('is_release', pa.bool_()),
+    ])
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+def _load_pyarrow():
+    global pa, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.parquet
+        pa, pq = pyarrow, pyarrow.parquet
+
+def arrow_chunks(chunks, file_format):
+    if not HAS_PYARROW:
+        raise RuntimeError('Parquet/Arrow export needs pyarrow, install it with `pip install pyarrow`')
+    _load_pyarrow()
+    schema, sink = _schema(), _Sink()
+    writer = pq.ParquetWriter(sink, schema) if file_format == 'parquet' else pa.ipc.new_stream(sink, schema)
+    for rows in chunks:
+        if rows:
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+# <--------------------Gzip on the Fly-------------------->
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# <--------------------Build the Export Stream-------------------->
+def export(file_format='csv', start=None, end=None, lot_ids=None, compress=False):
+    """Return an iterator of bytes/str chunks of the export in the given format."""
+    if file_format not in formats():
+        raise ValueError(f"Unsupported export format '{file_format}', choose from {', '.join(formats())}")
+    chunks = reservation_chunks(start, end, lot_ids)
+    output = csv_chunks(chunks) if file_format == 'csv' else arrow_chunks(chunks, file_format)
+    return gzip_chunks(output) if compress else output
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def filename(file_format, compress):
+    extension = {'csv': 'csv', 'parquet': 'parquet', 'arrow': 'arrows'}[file_format]
+    return f"reservations_{datetime.now():%Y%m%d_%H%M%S}.{extension}{'.gz' if compress else ''}"
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import defaultdict
+from flask import Response, request, session, g, has_app_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from controllers import cache, events
+
+# Upper bounds (seconds) of the request latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestMetrics:
+    """Per-endpoint request latency histograms & SQL statement counters of this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (endpoint, method) -> [count per bucket..., +Inf count]
+        self.buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+        self.duration_sum = defaultdict(float)
+        self.requests = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.query_seconds = defaultdict(float)
+
+    def record(self, endpoint, method, status, seconds, queries, query_seconds):
+        with self._lock:
+            buckets = self.buckets[(endpoint, method)]
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            self.duration_sum[(endpoint, method)] += seconds
+            self.requests[(endpoint, method, status)] += 1
+            self.queries[endpoint] += queries
+            self.query_seconds[endpoint] += query_seconds
+
+    # <--------------------Prometheus Text Format-------------------->
+    def render(self):
+        lines = [
+            '# HELP http_request_duration_seconds Request latency by endpoint.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for (endpoint, method), buckets in sorted(self.buckets.items()):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS, buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                cumulative += buckets[-1]
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {self.duration_sum[(endpoint, method)]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+            lines += ['# HELP http_requests_total Requests by endpoint & status.', '# TYPE http_requests_total counter']
+            lines += [f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}'
+                      for (endpoint, method, status), count in sorted(self.requests.items())]
+            lines += ['# HELP sql_queries_total SQL statements run by endpoint.', '# TYPE sql_queries_total counter']
+            lines += [f'sql_queries_total{{endpoint="{endpoint}"}} {count}' for endpoint, count in sorted(self.queries.items())]
+            lines += ['# HELP sql_query_duration_seconds_total Time spent in SQL statements by endpoint.', '# TYPE sql_query_duration_seconds_total counter']
+            lines += [f'sql_query_duration_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}' for endpoint, seconds in sorted(self.query_seconds.items())]
+        # Caches & live streams of this worker
+        lines += ['# TYPE cache_hits_total counter', '# TYPE cache_misses_total counter']
+        for name, stats in (('user', cache.user_cache.stats()), ('lot', cache.lot_cache.stats())):
+            lines.append(f'cache_hits_total{{cache="{name}"}} {stats["hits"]}')
+            lines.append(f'cache_misses_total{{cache="{name}"}} {stats["misses"]}')
+        lines += ['# TYPE occupancy_stream_clients gauge', f"occupancy_stream_clients {events.hub.stats()['subscribers']}"]
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
+
+# <--------------------Count SQL Statements-------------------->
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Statements don't nest on a connection, one start time is enough (and nothing leaks on errors)
+    conn.info['query_start'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_start', time.perf_counter())
+    # Only statements run while a request is being timed (not CLI commands or app start up)
+    if has_app_context() and 'request_start' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+# <--------------------Time Every Request-------------------->
+def init_metrics(app):
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or 'unmatched'
+        request_metrics.record(endpoint, request.method, response.status_code, elapsed, g.sql_queries, g.sql_seconds)
+        response.headers['Server-Timing'] = (f'app;dur={elapsed * 1000:.1f}, '
+                                             f'db;dur={g.sql_seconds * 1000:.1f};desc="{g.sql_queries} queries"')
+        # Flag N+1 patterns
+        if g.sql_queries > app.config['SQL_QUERY_THRESHOLD']:
+            app.logger.warning('%s %s (%s) ran %d SQL queries in %.1f ms', request.method, request.path, endpoint,
+                               g.sql_queries, g.sql_seconds * 1000)
+        return response
+
+    # <--------------------Prometheus Scrape Endpoint-------------------->
+    @app.route('/metrics')
+    def metrics():
+        # Admin session, or a key from API_KEYS as X-API-Key or bearer token
+        api_key = request.headers.get('X-API-Key') or request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not session.get('isadmin') and api_key not in current_app.config['API_KEYS']:
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,59 @@
+from sqlalchemy import func, case, update
+from models.models import db, ParkingLot, ParkingSpot, LotOccupancy
+
+# <--------------------Count Spots From ParkingSpot-------------------->
+def count_spots(lot_ids=None):
+    """Return {lot_id: (occupied, available)} computed from ParkingSpot (exclude soft deleted spots)."""
+    spot_status = db.session.query(
+        ParkingSpot.lot_id,
+        func.sum(case((((ParkingSpot.occupied == True) & (ParkingSpot.deleted_spot == False)), 1), else_=0)),
+        func.sum(case((((ParkingSpot.occupied == False) & (ParkingSpot.deleted_spot == False)), 1), else_=0))
+    )
+    if lot_ids is not None:
+        spot_status = spot_status.filter(ParkingSpot.lot_id.in_(lot_ids))
+    return {lot_id: (occupied or 0, available or 0) for lot_id, occupied, available in spot_status.group_by(ParkingSpot.lot_id).all()}
+
+# <--------------------Move Spots Between Available & Occupied-------------------->
+def adjust(lot_id, occupied_delta):
+    """Book (+1) or release (-1) spots in the counters, inside the caller's transaction."""
+    db.session.execute(
+        update(LotOccupancy)
+        .where(LotOccupancy.lot_id == lot_id)
+        .values(occupied=LotOccupancy.occupied + occupied_delta, available=LotOccupancy.available - occupied_delta)
+        .execution_options(synchronize_session=False)
+    )
+
+# <--------------------Recount a Single Lot-------------------->
+def refresh(lot_id):
+    """Recount the lot from ParkingSpot after spots are added, removed or the lot is deleted."""
+    occupied, available = count_spots([lot_id]).get(lot_id, (0, 0))
+    db.session.merge(LotOccupancy(lot_id=lot_id, occupied=occupied, available=available))
+
+# <--------------------Read Counters for the Home Page-------------------->
+def lot_status(lot_ids):
+    """Return {lot_id: {'number_of_spots', 'occupied', 'available_count'}} for the given lots.
+
+    Read only: every lot gets its counters row when it is created (older lots by migration 8),
+    a lot without one is reported empty instead of being counted & stored on a GET.
+    """
+    counters = {row.lot_id: (row.occupied, row.available) for row in LotOccupancy.query.filter(LotOccupancy.lot_id.in_(lot_ids)).all()}
+    status = {}
+    for lot_id in lot_ids:
+        occupied, available = counters.get(lot_id, (0, 0))
+        status[lot_id] = {'number_of_spots': occupied + available, 'occupied': occupied, 'available_count': available}
+    return status
+
+# <--------------------Rebuild All Counters-------------------->
+def reconcile():
+    """Rebuild every lot's counters from ParkingSpot and return the drift found as
+    a list of (lot_id, (stored_occupied, stored_available), (occupied, available))."""
+    actual = count_spots()
+    stored = {row.lot_id: (row.occupied, row.available) for row in LotOccupancy.query.all()}
+    drift = []
+    for (lot_id,) in db.session.query(ParkingLot.id).all():
+        counts = actual.get(lot_id, (0, 0))
+        if stored.get(lot_id) != counts:
+            drift.append((lot_id, stored.get(lot_id), counts))
+            db.session.merge(LotOccupancy(lot_id=lot_id, occupied=counts[0], available=counts[1]))
+    db.session.commit()
+    return drift
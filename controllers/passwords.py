@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from controllers.cache import LRUCache
+
+# Password hashing off the request threads: every worker process sends the CPU-bound
+# hashing to its own small process pool, so a login storm can't starve the other requests
+
+class PasswordBusy(Exception):
+    """No hashing slot became free within PASSWORD_QUEUE_TIMEOUT seconds."""
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+_pool_key = None
+
+# <--------------------Bounded Hashing Pool-------------------->
+def _executor():
+    # One pool per worker process, created on first use (after gunicorn forked the worker)
+    global _pool, _slots, _pool_key
+    config = current_app.config
+    key = (os.getpid(), config['PASSWORD_WORKERS'], config['PASSWORD_CONCURRENCY'])
+    with _lock:
+        if _pool_key != key:
+            if _pool is not None and _pool_key[0] == os.getpid():
+                _pool.shutdown(wait=False)
+            # spawn: forking a multi-threaded worker could copy held locks into the children
+            _pool = ProcessPoolExecutor(max_workers=config['PASSWORD_WORKERS'], mp_context=multiprocessing.get_context('spawn'))
+            # Hashes running or queued at once, the rest of the requests wait for a slot
+            _slots = threading.BoundedSemaphore(config['PASSWORD_CONCURRENCY'])
+            _pool_key = key
+        return _pool, _slots
+
+def _run(function, *args):
+    # PASSWORD_WORKERS=0 hashes in the request thread
+    if not current_app.config['PASSWORD_WORKERS']:
+        return function(*args)
+    pool, slots = _executor()
+    if not slots.acquire(timeout=current_app.config['PASSWORD_QUEUE_TIMEOUT']):
+        raise PasswordBusy()
+    try:
+        return pool.submit(function, *args).result()
+    finally:
+        slots.release()
+
+# <--------------------Hash & Verify-------------------->
+def hash_password(password):
+    """Hash with the configured PASSWORD_HASH_METHOD (e.g. 'scrypt:32768:8:1', 'pbkdf2:sha256:600000')."""
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+def verify_password(passhash, password):
+    """Check the password against the stored hash, raises PasswordBusy when the pool is saturated."""
+    return _run(check_password_hash, passhash, password)
+
+def _hash_parameters(method):
+    """Algorithm & parameters of a werkzeug method string with its defaults filled in,
+    so 'pbkdf2' equals 'pbkdf2:sha256:1000000' & 'scrypt' equals 'scrypt:32768:8:1'."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return (name, *(map(int, args) if args else (2**15, 8, 1)))
+    if name == 'pbkdf2':
+        return (name, args[0] if args else 'sha256', int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS)
+    return (name, *args)
+
+def needs_rehash(passhash):
+    # Hashes made with other parameters are upgraded on the next successful login
+    try:
+        return _hash_parameters(passhash.split('$', 1)[0]) != _hash_parameters(current_app.config['PASSWORD_HASH_METHOD'])
+    except ValueError:
+        return True
+
+# <--------------------Failed Login Throttle-------------------->
+# username -> monotonic times of the recent failed attempts (per worker process)
+failed_logins = LRUCache(maxsize=65536, ttl=300)
+_failures_lock = threading.Lock()
+
+def retry_after(username):
+    """Seconds until the username may try again, 0 when it is not locked out."""
+    window, limit = current_app.config['LOGIN_FAILURE_WINDOW'], current_app.config['LOGIN_MAX_FAILURES']
+    now = time.monotonic()
+    attempts = [attempt for attempt in failed_logins.get(username) or () if attempt > now - window]
+    if len(attempts) < limit:
+        return 0
+    return attempts[-limit] + window - now
+
+def record_failure(username):
+    window = current_app.config['LOGIN_FAILURE_WINDOW']
+    now = time.monotonic()
+    with _failures_lock:
+        attempts = [attempt for attempt in failed_logins.get(username) or () if attempt > now - window]
+        failed_logins.set(username, attempts[-current_app.config['LOGIN_MAX_FAILURES']:] + [now])
+
+def clear_failures(username):
+    failed_logins.delete(username)
+
+def init_passwords(app):
+    # Failed attempts are forgotten after the lockout window
+    failed_logins.ttl = app.config['LOGIN_FAILURE_WINDOW']
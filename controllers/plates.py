@@ -0,0 +1,64 @@
+import re
+import threading
+from models.models import db, ReserveParkingLot
+
+def normalize(vehicle_number):
+    """Plate key of a vehicle number: upper case letters & digits only ('mh 12-ab 1234' -> 'MH12AB1234')."""
+    return re.sub(r'[^A-Z0-9]', '', (vehicle_number or '').upper()) or None
+
+class OpenPlateIndex:
+    """plate -> booking_id of the open bookings, so exit gates find a vehicle in O(1).
+
+    Every worker keeps its own map, filled from the database on first use and kept in sync
+    by the bookings & releases it serves. A hit is confirmed with one primary key read, a
+    miss (booked by another worker) falls back to the ux_reserve_open_plate index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._booking_ids = None
+
+    # <--------------------Load Open Bookings-------------------->
+    def _load(self):
+        rows = db.session.query(ReserveParkingLot.plate, ReserveParkingLot.id)\
+            .filter(ReserveParkingLot.is_release == False, ReserveParkingLot.plate.isnot(None)).all()
+        self._booking_ids = dict(rows)
+
+    # <--------------------Keep in Sync-------------------->
+    def add(self, plate, booking_id):
+        with self._lock:
+            if self._booking_ids is not None and plate:
+                self._booking_ids[plate] = booking_id
+
+    def remove(self, plate, booking_id):
+        with self._lock:
+            # Only if the plate still points to this booking
+            if self._booking_ids is not None and self._booking_ids.get(plate) == booking_id:
+                del self._booking_ids[plate]
+
+    def invalidate(self):
+        # Reload everything on next lookup (after bulk changes)
+        with self._lock:
+            self._booking_ids = None
+
+    # <--------------------Find the Open Booking-------------------->
+    def open_booking(self, plate):
+        """Return the open ReserveParkingLot of the plate, or None."""
+        if not plate:
+            return None
+        with self._lock:
+            if self._booking_ids is None:
+                self._load()
+            booking_id = self._booking_ids.get(plate)
+        if booking_id is not None:
+            booking = db.session.get(ReserveParkingLot, booking_id)
+            if booking and not booking.is_release and booking.plate == plate:
+                return booking
+            # Released by another worker
+            self.remove(plate, booking_id)
+        booking = ReserveParkingLot.query.filter_by(plate=plate, is_release=False).first()
+        if booking:
+            self.add(plate, booking.id)
+        return booking
+
+open_plates = OpenPlateIndex()
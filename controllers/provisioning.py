@@ -0,0 +1,62 @@
+from sqlalchemy import insert, update, select, func, cast, Integer
+from models.models import db, ParkingSpot
+
+CHUNK_SIZE = 5000
+
+def spot_number(number):
+    return 'P{:03d}'.format(number)
+
+def spot_index(spot_number):
+    # Number of a spot for ordering, as strings P1200 would sort before P999
+    return int(spot_number[1:])
+
+# spot_index() in SQL
+SPOT_INDEX = cast(func.substr(ParkingSpot.spot_number, 2), Integer)
+
+# <--------------------Create Spots in Bulk-------------------->
+def add_spots(lot, count, chunk_size=CHUNK_SIZE):
+    """Insert `count` new spots numbered after the lot's high-water mark, in executemany chunks."""
+    first = lot.last_spot_number + 1
+    for start in range(first, first + count, chunk_size):
+        stop = min(start + chunk_size, first + count)
+        db.session.execute(insert(ParkingSpot), [
+            {'lot_id': lot.id, 'spot_number': spot_number(number), 'occupied': False, 'deleted_spot': False}
+            for number in range(start, stop)
+        ])
+    # Numbers are never reused, even after spots are deleted
+    lot.last_spot_number = first + count - 1
+
+# <--------------------Reactivate Soft Deleted Spots-------------------->
+def reactivate_spots(lot_id, count):
+    """Bring back up to `count` soft deleted spots (lowest numbers first) and return how many came back."""
+    spot_ids = select(ParkingSpot.id)\
+        .filter_by(lot_id=lot_id, deleted_spot=True)\
+        .order_by(SPOT_INDEX.asc()).limit(count)
+    result = db.session.execute(
+        update(ParkingSpot).where(ParkingSpot.id.in_(spot_ids)).values(deleted_spot=False)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+# <--------------------Soft Delete Free Spots-------------------->
+def remove_spots(lot_id, count):
+    """Soft delete up to `count` free spots (highest numbers first) and return how many were removed."""
+    spot_ids = select(ParkingSpot.id)\
+        .filter_by(lot_id=lot_id, occupied=False, deleted_spot=False)\
+        .order_by(SPOT_INDEX.desc()).limit(count)
+    result = db.session.execute(
+        update(ParkingSpot).where(ParkingSpot.id.in_(spot_ids)).values(deleted_spot=True)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+# <--------------------Resize a Lot-------------------->
+def resize(lot, spot_diff):
+    """Grow (+) or shrink (-) the lot by spot_diff spots with set-based statements."""
+    if spot_diff > 0:
+        # First try to reactivate soft-deleted spots, then create new ones for the rest
+        spot_diff -= reactivate_spots(lot.id, spot_diff)
+        if spot_diff > 0:
+            add_spots(lot, spot_diff)
+    elif spot_diff < 0:
+        remove_spots(lot.id, -spot_diff)
@@ -0,0 +1,114 @@
+from collections import defaultdict
+from sqlalchemy import func, case, extract, delete
+from sqlalchemy.dialects.sqlite import insert
+from models.models import db, ParkingSpot, LotMonthlyRollup, UserMonthlyRollup
+from controllers import archive
+
+# <--------------------Add Deltas to a Rollup Row-------------------->
+def _bump(model, key, **deltas):
+    """Insert the (key, year, month) row or add the deltas to it, inside the caller's transaction."""
+    statement = insert(model).values(**key, **deltas)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: getattr(model, name) + statement.excluded[name] for name in deltas}
+    ))
+
+def record_booking(lot_id, user_id, in_time):
+    _bump(LotMonthlyRollup, {'lot_id': lot_id, 'year': in_time.year, 'month': in_time.month}, active_booking=1)
+    _bump(UserMonthlyRollup, {'user_id': user_id, 'year': in_time.year, 'month': in_time.month}, active_booking=1)
+
+def record_release(lot_id, user_id, in_time, out_time, total_cost):
+    # Booking moves from active to complete in its in_time month, the lot earns in the out_time month
+    _bump(LotMonthlyRollup, {'lot_id': lot_id, 'year': in_time.year, 'month': in_time.month}, active_booking=-1, complete_booking=1)
+    _bump(LotMonthlyRollup, {'lot_id': lot_id, 'year': out_time.year, 'month': out_time.month}, earning=total_cost)
+    _bump(UserMonthlyRollup, {'user_id': user_id, 'year': in_time.year, 'month': in_time.month},
+          active_booking=-1, complete_booking=1, spend=total_cost)
+
+def _bump_many(model, key_names, rows):
+    # _bump() for many rows with one executemany upsert, every row has the same delta columns
+    if not rows:
+        return
+    statement = insert(model)
+    deltas = [name for name in rows[0] if name not in key_names]
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=key_names,
+        set_={name: getattr(model, name) + statement.excluded[name] for name in deltas}
+    ), rows)
+
+def record_releases(releases):
+    """record_release() for many bookings: releases is a list of (lot_id, user_id, in_time, out_time, total_cost)."""
+    lot_completes, lot_earnings = defaultdict(int), defaultdict(float)
+    user_completes, user_spends = defaultdict(int), defaultdict(float)
+    for lot_id, user_id, in_time, out_time, total_cost in releases:
+        lot_completes[(lot_id, in_time.year, in_time.month)] += 1
+        lot_earnings[(lot_id, out_time.year, out_time.month)] += total_cost
+        user_completes[(user_id, in_time.year, in_time.month)] += 1
+        user_spends[(user_id, in_time.year, in_time.month)] += total_cost
+    _bump_many(LotMonthlyRollup, ['lot_id', 'year', 'month'], [
+        {'lot_id': lot_id, 'year': year, 'month': month, 'active_booking': -count, 'complete_booking': count}
+        for (lot_id, year, month), count in lot_completes.items()
+    ])
+    _bump_many(LotMonthlyRollup, ['lot_id', 'year', 'month'], [
+        {'lot_id': lot_id, 'year': year, 'month': month, 'earning': earning}
+        for (lot_id, year, month), earning in lot_earnings.items()
+    ])
+    _bump_many(UserMonthlyRollup, ['user_id', 'year', 'month'], [
+        {'user_id': user_id, 'year': year, 'month': month, 'active_booking': -count, 'complete_booking': count,
+         'spend': user_spends[(user_id, year, month)]}
+        for (user_id, year, month), count in user_completes.items()
+    ])
+
+def record_rerate(lot_deltas, user_deltas):
+    """Apply total_cost changes of re-rated bookings: {(lot_id|user_id, year, month): cost delta}."""
+    for (lot_id, year, month), delta in lot_deltas.items():
+        _bump(LotMonthlyRollup, {'lot_id': lot_id, 'year': year, 'month': month}, earning=delta)
+    for (user_id, year, month), delta in user_deltas.items():
+        _bump(UserMonthlyRollup, {'user_id': user_id, 'year': year, 'month': month}, spend=delta)
+
+# <--------------------Rebuild Rollups From History-------------------->
+def rebuild():
+    """Rebuild both rollup tables from ReserveParkingLot & the archive inside the caller's transaction,
+    return the number of rows written. Migration 7 runs it once for databases that predate the rollups."""
+    reservations = archive.history()
+    complete = func.sum(case((reservations.is_release == True, 1), else_=0))
+    active = func.sum(case((reservations.is_release == False, 1), else_=0))
+    in_year, in_month = extract('year', reservations.in_time), extract('month', reservations.in_time)
+    out_year, out_month = extract('year', reservations.out_time), extract('month', reservations.out_time)
+
+    lot_rows = defaultdict(lambda: {'complete_booking': 0, 'active_booking': 0, 'earning': 0})
+    lot_bookings = db.session.query(ParkingSpot.lot_id, in_year, in_month, complete, active)\
+        .join(ParkingSpot, ParkingSpot.id == reservations.spot_id)\
+        .group_by(ParkingSpot.lot_id, in_year, in_month).all()
+    for lot_id, year, month, complete_booking, active_booking in lot_bookings:
+        lot_rows[(lot_id, year, month)].update(complete_booking=complete_booking, active_booking=active_booking)
+    lot_earnings = db.session.query(ParkingSpot.lot_id, out_year, out_month, func.sum(reservations.total_cost))\
+        .join(ParkingSpot, ParkingSpot.id == reservations.spot_id)\
+        .filter(reservations.is_release == True)\
+        .group_by(ParkingSpot.lot_id, out_year, out_month).all()
+    for lot_id, year, month, earning in lot_earnings:
+        lot_rows[(lot_id, year, month)]['earning'] = earning or 0
+
+    user_rows = db.session.query(
+        reservations.user_id, in_year, in_month, complete, active,
+        func.sum(case((reservations.is_release == True, reservations.total_cost), else_=0))
+    ).group_by(reservations.user_id, in_year, in_month).all()
+
+    db.session.execute(delete(LotMonthlyRollup))
+    db.session.execute(delete(UserMonthlyRollup))
+    if lot_rows:
+        db.session.execute(insert(LotMonthlyRollup), [
+            {'lot_id': lot_id, 'year': year, 'month': month, **values} for (lot_id, year, month), values in lot_rows.items()
+        ])
+    if user_rows:
+        db.session.execute(insert(UserMonthlyRollup), [
+            {'user_id': user_id, 'year': year, 'month': month, 'complete_booking': complete_booking,
+             'active_booking': active_booking, 'spend': spend or 0}
+            for user_id, year, month, complete_booking, active_booking, spend in user_rows
+        ])
+    return len(lot_rows) + len(user_rows)
+
+def backfill():
+    """rebuild() & commit, for `flask backfill-rollups` & the synthetic data generator."""
+    rows = rebuild()
+    db.session.commit()
+    return rows
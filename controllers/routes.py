@@ -1,13 +1,29 @@
-from flask import render_template, request, flash, redirect, url_for, session
+from flask import render_template, request, flash, redirect, url_for, session, stream_template, stream_with_context, g
 from models.models import *
-from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-from sqlalchemy import func, case
+import time
+import heapq
+from sqlalchemy import func, case, update
 from datetime import datetime
 from math import ceil
 from collections import defaultdict
-from sqlalchemy import extract, or_, cast, String
+from types import SimpleNamespace
+from sqlalchemy import extract, tuple_
 from sqlalchemy.orm import joinedload
+from controllers.allocator import allocator
+from controllers import occupancy, search, export, billing, provisioning, cache, bookings, events, passwords, eventlog, archive
+
+def buffered(chunks, size=64 * 1024):
+    # Join the small pieces a streamed template yields into larger response chunks
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
 
 def init_routes(app):
     # <------------------------Landing Page----------------------->
@@ -22,8 +38,48 @@ def init_routes(app):
             if 'user_id' not in session:
                 flash('Please log in to continue')
                 return redirect(url_for('login'))
+            # Load the logged-in user once per request (served from the user cache when possible)
+            g.current_user = cache.get_user(session['user_id'])
+            if g.current_user is None:
+                session.pop('user_id', None)
+                flash('Please log in to continue')
+                return redirect(url_for('login'))
             return func(*args, **kwargs)
         return approve_auth
+
+    # <-----------------Paginate or Stream Bookings----------------->
+    def render_bookings(queries, sort_key, is_history, search_query, endpoint):
+        # queries: [(query, model)], the hot table & the archive for the history, merged into one list
+        # Newest first, `id` breaks the tie between bookings with the same time (ids are never reused, migration 6)
+        queries = [(query.order_by(getattr(model, sort_key).desc(), model.id.desc()), model) for query, model in queries]
+        newest_first = lambda booking: (getattr(booking, sort_key), booking.id)
+        # Stream mode renders rows as they are read from the database, so memory stays bounded
+        if request.args.get('stream'):
+            rows = heapq.merge(*(query.yield_per(500) for query, _ in queries), key=newest_first, reverse=True)
+            return app.response_class(buffered(stream_template('bookings.html', bookings=rows, is_history=is_history, empty=False,
+                                                               search_action=url_for(endpoint))))
+        # Keyset pagination on (sort_key, id), cursor is "<iso time>_<id>" of the last row shown
+        page_size = max(1, min(request.args.get('page_size', 50, type=int), 200))
+        after = request.args.get('after', '')
+        try:
+            after_time, after_id = after.rsplit('_', 1)
+            cursor = tuple_(datetime.fromisoformat(after_time), int(after_id))
+            queries = [(query.filter(tuple_(getattr(model, sort_key), model.id) < cursor), model) for query, model in queries]
+        except ValueError:
+            after = ''
+        # Fetch one extra booking of every table to know whether a next page exists
+        bookings = sorted((booking for query, _ in queries for booking in query.limit(page_size + 1).all()), key=newest_first, reverse=True)
+        next_after = None
+        if len(bookings) > page_size:
+            last = bookings[page_size - 1]
+            next_after = f"{getattr(last, sort_key).isoformat()}_{last.id}"
+            bookings = bookings[:page_size]
+        # If Search Result Not Found
+        if search_query and not(bookings):
+            flash(f'No result found for {search_query}!')
+        return render_template('bookings.html', bookings=bookings, empty=not bookings, is_history=is_history,
+                               search_action=url_for(endpoint), search_query=search_query, page_size=page_size,
+                               after=after, next_after=next_after)
     
     # <--------------------------------------------------------------------------------CRUD Operations-------------------------------------------------------------------------------->
     
@@ -56,7 +112,11 @@ def init_routes(app):
             flash('Username already exists')
             return redirect(url_for('register'))
         # Save password in hash form in database for security
-        passhash = generate_password_hash(password)
+        try:
+            passhash = passwords.hash_password(password)
+        except passwords.PasswordBusy:
+            flash('Server is busy, please try again')
+            return redirect(url_for('register'))
         new_user = User(username=username, passhash=passhash, name=name, city=city, pincode=pincode)
         db.session.add(new_user)
         db.session.commit()
@@ -90,10 +150,16 @@ def init_routes(app):
             )
             db.session.add(new_lot)
             db.session.flush()  # Flush to ensure the new lot is added in ParkingLot table before adding the spots in ParkingSpot table 
-            # Create ParkingSpot
-            new_spots = [ParkingSpot(lot_id = new_lot.id, spot_number ='P{:03d}'.format(i+1), occupied = False) for i in range(int(number_of_spots))]
-            db.session.add_all(new_spots)
+            # Create ParkingSpot in bulk
+            provisioning.add_spots(new_lot, int(number_of_spots))
+            # Start the lot occupancy counters with every spot available
+            db.session.add(LotOccupancy(lot_id=new_lot.id, occupied=0, available=int(number_of_spots)))
             db.session.commit()
+            allocator.invalidate(new_lot.id)
+            cache.invalidate_lot(new_lot.id)
+            cache.invalidate_spots(new_lot.id)
+            eventlog.lot_resized(new_lot.id, int(number_of_spots))
+            events.publish_lots([new_lot.id])
             flash(f"Parking lot '{parking_name}' added successfully")
             return redirect(url_for('home'))
         # Rollback the changes if process failed in middle
@@ -106,27 +172,24 @@ def init_routes(app):
     @app.route('/active_booking_post/<int:lot_id>', methods=['POST'])
     @login_auth
     def active_booking_post(lot_id):
+        spot_number = request.form.get('spot_number')
         try:
             # Get the user booking details from pre-filled Form in booking_detail page
             user_id = session['user_id']
-            spot_number = request.form.get('spot_number')
             in_time_str = request.form.get('in_time')  # Gets string from form
             in_time = datetime.strptime(in_time_str, '%Y-%m-%d %H:%M:%S') # Convert in_time string into datetime
             vehicle_number = request.form.get('vehicle_number')
-            spot = ParkingSpot.query.filter_by(lot_id=lot_id, spot_number=spot_number).first()
-            spot_id = spot.id
-            # Change occupied status to true
-            spot.occupied = True
-            db.session.flush()  # Flush to ensure the spot occupied status is updated before updating the reservation table 
-            # Updating the ReserveParkingLot Table
-            new_reservation = ReserveParkingLot(user_id=user_id, spot_id=spot_id, in_time= in_time, vehicle_number=vehicle_number)
-            db.session.add(new_reservation)
-            db.session.commit()
+            # Claim a spot & add the reservation (rolled back by bookings.book on failure)
+            reservation = bookings.book(user_id, lot_id, vehicle_number, in_time, spot_number)
+            if not reservation:
+                flash("No free spot left in this parking lot")
+                return redirect(url_for('home'))
             flash('Spot reserve successfully')
             return redirect(url_for('active_booking'))
-        # Rollback the changes if process failed in middle
+        except bookings.VehicleAlreadyParked:
+            flash(f"Vehicle {vehicle_number} already has an active booking")
+            return redirect(url_for('active_booking'))
         except Exception as e:
-            db.session.rollback()
             flash(f"Error reserving a parking spot: {spot_number}")
             return redirect(url_for('active_booking'))
     
@@ -138,48 +201,21 @@ def init_routes(app):
     def home():
         # Get the Search Query
         search_query = request.args.get("q", "").strip()
-        # Fetch all parking lots form database (exclude soft deleted lots)
-        lots_query = ParkingLot.query.filter_by(deleted_lot=False)
         # If search is perform
         if search_query:
-            lots_query = lots_query.filter(
-                or_(
-                    ParkingLot.parking_name.ilike(f"%{search_query}%"),
-                    ParkingLot.city.ilike(f"%{search_query}%"),
-                    ParkingLot.address.ilike(f"%{search_query}%"),
-                    cast(ParkingLot.pincode, String).ilike(f"%{search_query}%")
-                )
-            )
-        # Fetch all the lots
-        lots = lots_query.all()
+            # Search the parking lots in database (exclude soft deleted lots)
+            lots = search.filter_lots(ParkingLot.query.filter_by(deleted_lot=False), search_query).all()
+        else:
+            # All parking lots from the lot cache, read from database only after a lot changed
+            lots = cache.get_lots()
         # If Search Result Not Found
         if search_query and not(lots):
             flash(f'No result found for {search_query}!')
-        # Group occupied & available spot lot wise (exclude soft deleted spots)
-        spot_status = db.session.query(
-            ParkingSpot.lot_id,
-            func.sum(
-                case(
-                    (((ParkingSpot.occupied == True) & (ParkingSpot.deleted_spot == False)), 1),
-                    else_=0
-                )
-            ).label('occupied_count'),
-            func.sum(
-                case(
-                    (((ParkingSpot.occupied == False) & (ParkingSpot.deleted_spot == False)), 1),
-                    else_=0
-                )
-            ).label('available_count')
-        ).group_by(ParkingSpot.lot_id).all()
-        # Convert to dict for easy lookup
-        spot_status_dict = {
-            lot_id: {
-                'number_of_spots': occupied+available_count,
-                'occupied': occupied,
-                'available_count': available_count
-            } for lot_id, occupied, available_count in spot_status
-        }
-        return render_template('index.html', lots=lots, spot_status=spot_status_dict, search_action=url_for('home'))
+        # Read occupied & available spot counters of the listed lots only
+        spot_status_dict = occupancy.lot_status([lot.id for lot in lots])
+        # Live counters are opt-in (?live=1), every open stream holds a worker thread
+        return render_template('index.html', lots=lots, spot_status=spot_status_dict, search_action=url_for('home'),
+                               live=bool(request.args.get('live')))
     
     # <----------------Login Authentication---------------->
     @app.route('/login')
@@ -194,16 +230,36 @@ def init_routes(app):
         if not username or not password:
             flash('Please fill out all fields')
             return redirect(url_for('login'))
+        # Reject bursts of failed attempts before spending any time on hashing
+        wait = passwords.retry_after(username)
+        if wait:
+            flash(f'Too many failed attempts, try again in {ceil(wait / 60)} minute(s)')
+            return redirect(url_for('login'))
         # Get the user detail
         user = User.query.filter_by(username=username).first()
-        # Check this username & password combination avilable in database
-        if not user or not check_password_hash(user.passhash, password):
+        # Check this username & password combination avilable in database (hashed in the worker's process pool)
+        try:
+            valid = user is not None and passwords.verify_password(user.passhash, password)
+        except passwords.PasswordBusy:
+            flash('Server is busy, please try again')
+            return redirect(url_for('login'))
+        if not valid:
+            passwords.record_failure(username)
             flash('Invalid username or password')
             return redirect(url_for('login'))
+        passwords.clear_failures(username)
         # Check if user is soft deleted from database.
         if user.deleted_user:
             flash('User has been deleted. Contact Admin')
             return redirect(url_for('login'))
+        # Upgrade a hash made with older parameters while the password is at hand (skipped when busy)
+        if passwords.needs_rehash(user.passhash):
+            try:
+                user.passhash = passwords.hash_password(password)
+                db.session.commit()
+                cache.invalidate_user(user.id)
+            except passwords.PasswordBusy:
+                pass
         # Above condition satisfied then login the user and save the user_id in session for authentication 
         flash('Login successfully')
         flash('Welcome back, {}!'.format(user.name))
@@ -223,20 +279,37 @@ def init_routes(app):
     @app.route('/profile')
     @login_auth
     def profile():
-        # Fetch the user detail from database
-        user = User.query.get(session['user_id'])
-        return render_template('profile.html', user=user)
+        # User detail is already loaded by login_auth
+        return render_template('profile.html', user=g.current_user)
     
     # <------------------------Show Spots------------------------->
     @app.route('/show_spot/<int:lot_id>')
     @login_auth
     def show_spot(lot_id):
-        # Fetch parking lot detail from database
-        lot = ParkingLot.query.get(lot_id)
+        # Fetch parking lot detail from the lot cache
+        lot = cache.get_lot(lot_id)
         lot_price = f'{lot.price:.2f}'
         lot_name = lot.parking_name
-        # Fetch all the realated to parking lot spots from database (exclude soft deleted spots)
-        spots = ParkingSpot.query.filter_by(lot_id=lot_id, deleted_spot=False).all()
+        # Fetch active reservation & user of every spot in the lot with one joined query
+        active_reservations = db.session.query(
+            ReserveParkingLot.spot_id,
+            User.name,
+            ReserveParkingLot.in_time,
+            ReserveParkingLot.vehicle_number
+        ).join(User, User.id == ReserveParkingLot.user_id)\
+        .join(ParkingSpot, ParkingSpot.id == ReserveParkingLot.spot_id)\
+        .filter(ParkingSpot.lot_id == lot_id, ReserveParkingLot.is_release == False)\
+        .order_by(ReserveParkingLot.in_time.asc()).all()
+        # Map spot_id with its occupant (most recent reservation wins)
+        occupants = {
+            spot_id: {
+                'user_name': user_name,
+                'in_time': in_time,
+                'vehicle_number': vehicle_number
+            } for spot_id, user_name, in_time, vehicle_number in active_reservations
+        }
+        # Spots of the lot from the lot cache (exclude soft deleted spots), occupied from the live reservations above
+        spots = [SimpleNamespace(**vars(spot), occupied=spot.id in occupants) for spot in cache.get_spots(lot_id)]
         # Calculate the number of occupied_count and available_count
         occupied_count = sum(1 for spot in spots if spot.occupied)
         available_count = len(spots) - occupied_count
@@ -246,41 +319,56 @@ def init_routes(app):
             'lot_name' : lot_name,
             'lot_price' :lot_price,
             'spots' : spots,
+            'occupants' : occupants,
             'occupied_count' : occupied_count,
-            'available_count' : available_count
+            'available_count' : available_count,
+            'live' : bool(request.args.get('live'))
         }
         return render_template('show_spot.html', **spot_info)
     
+    # <-------------------Live Occupancy Stream------------------->
+    @app.route('/occupancy/stream')
+    @login_auth
+    def occupancy_stream():
+        # Server-Sent Events: counters of the lots (?lot_id=1&lot_id=2, all lots by default) pushed on every change,
+        # with ?spots=1 also every spot taken or freed
+        lot_ids = request.args.getlist('lot_id', type=int)
+        response = app.response_class(stream_with_context(events.stream(lot_ids, bool(request.args.get('spots')))),
+                                      mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+        return response
+    
     # <-------------------Show Booking Details-------------------->
     @app.route('/booking_detail/<int:id>/<string:is_booking>')
     @login_auth
     def booking_detail(id,is_booking):
         # Check booking stage is_booking true when booking the spot & is_booking false when relasing a spot
         is_booking = is_booking.lower() == 'true'
-        # Fetch username details form database
-        user = User.query.filter_by(id = session['user_id']).first()
-        username = user.name
+        # Username of the logged-in user (loaded by login_auth)
+        username = g.current_user.name
         # Fetch the booking details form database
         if is_booking:
             # Fetch spot detail when booking the spot & Calculate the in_time. Here `id` use as `lot_id`
-            spot = ParkingSpot.query.filter_by(lot_id=id, occupied=False, deleted_spot = False).order_by(ParkingSpot.spot_number.asc()).first()
+            next_spot = allocator.peek(id)
+            if not next_spot:
+                flash('Slot Not Available')
+                return redirect(url_for('home'))
+            spot_number = next_spot[1]
+            lot = cache.get_lot(id)
             in_time = datetime.now().replace(microsecond=0) 
         else:
             # Fetch spot detail when releasing it. Here's `id` use as `booking_id`
             booking = ReserveParkingLot.query.filter_by(id=id).first()
-            spot = booking.parking_spot
+            spot_number = booking.parking_spot.spot_number
+            lot = cache.get_lot(booking.parking_spot.lot_id)
             vehicle_number = booking.vehicle_number
             in_time = booking.in_time
             out_time = datetime.now().replace(microsecond=0)
-            price = spot.parking_lot.price
-            in_time = booking.in_time
-            time_diff = out_time - in_time
-            hours = ceil(time_diff.total_seconds() / 3600)  # Convert to hours and round up
-            total_cost = price * hours
-        spot_number = spot.spot_number
-        parking_name = spot.parking_lot.parking_name
-        address = f"{spot.parking_lot.address}, {spot.parking_lot.city}, Pin Code = {spot.parking_lot.pincode}"
-        price = f"{spot.parking_lot.price:.2f}"
+            hours, total_cost = billing.charge(in_time, out_time, lot.price)
+        parking_name = lot.parking_name
+        address = f"{lot.address}, {lot.city}, Pin Code = {lot.pincode}"
+        price = f"{lot.price:.2f}"
         # Convert to dict for easy lookup
         booking_info = {
             'id' : id,
@@ -302,7 +390,6 @@ def init_routes(app):
     @app.route('/active_booking')
     @login_auth
     def active_booking():
-        empty = False
         active_bookings = ReserveParkingLot.query \
             .join(User) \
             .join(ParkingSpot) \
@@ -319,71 +406,36 @@ def init_routes(app):
         search_query = request.args.get("q", "").strip()
         # If search is perform
         if search_query:
-            active_bookings = active_bookings.filter(
-                or_(
-                    ReserveParkingLot.vehicle_number.ilike(f"{search_query}%"),
-                    User.username.ilike(f"%{search_query}%"),
-                    ParkingLot.parking_name.ilike(f"%{search_query}%"),
-                    ParkingLot.city.ilike(f"%{search_query}%"),
-                    ParkingLot.address.ilike(f"%{search_query}%"),
-                    cast(ParkingSpot.spot_number, String).ilike(f"%{search_query}%"),
-                    cast(ParkingLot.pincode, String).ilike(f"%{search_query}%")
-                )
-            )
-        # Fetch all the lots
-        active_bookings = active_bookings.all()
-        # If Search Result Not Found
-        if search_query and not(active_bookings):
-            flash(f'No result found for {search_query}!')
-        # Use this to handel the situation when query result is None
-        if not active_bookings:
-            active_bookings = [{'is_release': False}]
-            empty = True
-        return render_template('bookings.html', bookings=active_bookings, empty = empty, search_action=url_for('active_booking'))
+            active_bookings = search.filter_reservations(active_bookings, search_query)
+        # Active bookings have no out_time yet, page them by in_time
+        return render_bookings([(active_bookings, ReserveParkingLot)], 'in_time', False, search_query, 'active_booking')
     
     # <--------------------Show Booking History------------------->
     @app.route('/booking_history')
     @login_auth
     def booking_history():
-        empty = False
-        # Fetch all booking history
-        bookings_query = ReserveParkingLot.query \
-            .join(User) \
-            .join(ParkingSpot) \
-            .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id) \
-            .options(
-                joinedload(ReserveParkingLot.user),
-                joinedload(ReserveParkingLot.parking_spot).joinedload(ParkingSpot.parking_lot)
-            ) \
-            .filter(ReserveParkingLot.is_release == True)
-        # Filter by logged-in user if not admin
-        if not session['isadmin']:
-            bookings_query = bookings_query.filter(ReserveParkingLot.user_id == session['user_id'])
         # Get the Search Query
         search_query = request.args.get("q", "").strip()
-        # If search is perform
-        if search_query:
-            bookings_query = bookings_query.filter(
-                or_(
-                    ReserveParkingLot.vehicle_number.ilike(f"{search_query}%"),
-                    User.username.ilike(f"%{search_query}%"),
-                    ParkingLot.parking_name.ilike(f"%{search_query}%"),
-                    ParkingLot.city.ilike(f"%{search_query}%"),
-                    ParkingLot.address.ilike(f"%{search_query}%"),
-                    cast(ParkingSpot.spot_number, String).ilike(f"%{search_query}%"),
-                    cast(ParkingLot.pincode, String).ilike(f"%{search_query}%")
-                )
-            )
-        # Fetch all the lots
-        bookings = bookings_query.all()
-        # If Search Result Not Found
-        if search_query and not(bookings):
-            flash(f'No result found for {search_query}!')
-        # Use this to handel the situation when query result is None
-        if not bookings:
-            bookings = [{'is_release': True}]
-            empty = True
-        return render_template('bookings.html', bookings=bookings, empty=empty, search_action=url_for('booking_history'))
+        # Fetch all booking history, recent bookings from ReserveParkingLot & older ones from the archive
+        queries = []
+        for model in (ReserveParkingLot, ArchivedReservation):
+            bookings_query = model.query \
+                .join(User, User.id == model.user_id) \
+                .join(ParkingSpot, ParkingSpot.id == model.spot_id) \
+                .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id) \
+                .options(
+                    joinedload(model.user),
+                    joinedload(model.parking_spot).joinedload(ParkingSpot.parking_lot)
+                ) \
+                .filter(model.is_release == True)
+            # Filter by logged-in user if not admin
+            if not session['isadmin']:
+                bookings_query = bookings_query.filter(model.user_id == session['user_id'])
+            # If search is perform
+            if search_query:
+                bookings_query = search.filter_reservations(bookings_query, search_query, model)
+            queries.append((bookings_query, model))
+        return render_bookings(queries, 'out_time', True, search_query, 'booking_history')
     
     # <-------------Show User List on Admin Dashboard------------->
     @app.route('/users_list')
@@ -395,101 +447,137 @@ def init_routes(app):
         users_query = User.query.filter_by(isadmin = not(session['isadmin']), deleted_user = False)
         # If search is perform
         if search_query:
-            users_query = users_query.filter(
-                or_(
-                    User.username.ilike(f"%{search_query}%"),
-                    User.name.ilike(f"%{search_query}%"),
-                    User.city.ilike(f"%{search_query}%"),
-                    cast(User.pincode, String).ilike(f"%{search_query}%")
-                )
-            )
-        # Fetch all the users
-        users = users_query.all()
+            users_query = search.filter_users(users_query, search_query)
+        # Keyset pagination on user id, so page cost depends on page size and not on total users
+        page_size = max(1, min(request.args.get('page_size', 20, type=int), 100))
+        after_id = request.args.get('after', 0, type=int)
+        # Fetch one extra user to know whether a next page exists
+        users = users_query.filter(User.id > after_id).order_by(User.id.asc()).limit(page_size + 1).all()
+        next_after = users[page_size - 1].id if len(users) > page_size else None
+        users = users[:page_size]
         # If Search Result Not Found
         if search_query and not(users):
             flash(f'No result found for {search_query}!')
-        # Map user with its booking status
-        booking_stats = {user.id: {
-            'active': ReserveParkingLot.query.filter_by(user_id=user.id, is_release=False).count(),
-            'complete': ReserveParkingLot.query.filter_by(user_id=user.id, is_release=True).count()
-            } for user in users
-        }
-        return render_template('users_list.html', users= users, booking_stats=booking_stats, search_action=url_for('users_list'))
+        # Count active & complete bookings of the users in this page from the monthly rollups
+        # (covers the archived history without reading any reservation)
+        booking_status = db.session.query(
+            UserMonthlyRollup.user_id,
+            func.sum(UserMonthlyRollup.active_booking).label('active'),
+            func.sum(UserMonthlyRollup.complete_booking).label('complete')
+        ).filter(UserMonthlyRollup.user_id.in_([user.id for user in users]))\
+        .group_by(UserMonthlyRollup.user_id).all()
+        # Map user with its booking status (users without any booking get zero counts)
+        booking_stats = {user.id: {'active': 0, 'complete': 0} for user in users}
+        for user_id, active, complete in booking_status:
+            booking_stats[user_id] = {'active': active, 'complete': complete}
+        return render_template('users_list.html', users= users, booking_stats=booking_stats, search_action=url_for('users_list'),
+                               search_query=search_query, page_size=page_size, after_id=after_id, next_after=next_after)
     
+    # <-------------Export Reservations for Finance------------->
+    @app.route('/export/reservations')
+    @login_auth
+    def export_reservations():
+        if not session['isadmin']:
+            flash('Only admin can export reservations')
+            return redirect(url_for('home'))
+        # Filters: ?format=csv|parquet|arrow&start=YYYY-MM-DD&end=YYYY-MM-DD&lot_id=1&lot_id=2&gzip=1
+        file_format = request.args.get('format', 'csv').lower()
+        compress = bool(request.args.get('gzip'))
+        try:
+            chunks = export.export(
+                file_format,
+                export.parse_date(request.args.get('start')),
+                export.parse_date(request.args.get('end')),
+                request.args.getlist('lot_id', type=int),
+                compress
+            )
+        except ValueError as e:
+            flash(f'Error exporting reservations: {e}')
+            return redirect(url_for('booking_history'))
+        mimetype = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet', 'arrow': 'application/vnd.apache.arrow.stream'}[file_format]
+        return app.response_class(
+            stream_with_context(chunks),
+            mimetype='application/gzip' if compress else mimetype,
+            headers={'Content-Disposition': f'attachment; filename={export.filename(file_format, compress)}'}
+        )
+
     # <-------------Show Dashboard Charts------------->
     @app.route('/dashboard')
     def dashboard():
+        # Monthly charts show one calendar year at a time
+        year = request.args.get('year', datetime.now().year, type=int)
         if session['isadmin']:
             # Group total complete_booking & active_booking lot wise
             booking_status_lot_wise = db.session.query(
                 ParkingLot.parking_name,
-                func.sum(case((ReserveParkingLot.is_release == True, 1), else_=0)).label('complete_booking'),
-                func.sum(case((ReserveParkingLot.is_release == False, 1), else_=0)).label('active_booking')
-            ).join(ParkingSpot, ParkingSpot.id == ReserveParkingLot.spot_id)\
-            .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
+                func.sum(LotMonthlyRollup.complete_booking).label('complete_booking'),
+                func.sum(LotMonthlyRollup.active_booking).label('active_booking')
+            ).join(ParkingLot, ParkingLot.id == LotMonthlyRollup.lot_id)\
             .group_by(ParkingLot.parking_name).all()
             # Group total monthly earning lot wise
             lot_monthly_collection = db.session.query(
                 ParkingLot.parking_name,
-                extract('month', ReserveParkingLot.out_time).label('month'),
-                func.sum(ReserveParkingLot.total_cost).label('monthly_earning')
-            ).join(ParkingSpot, ParkingSpot.id == ReserveParkingLot.spot_id)\
-            .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
-            .filter(ReserveParkingLot.is_release == True)\
-            .group_by(ParkingLot.parking_name, 'month')\
-            .order_by('month').all()
+                LotMonthlyRollup.month,
+                func.sum(LotMonthlyRollup.earning).label('monthly_earning')
+            ).join(ParkingLot, ParkingLot.id == LotMonthlyRollup.lot_id)\
+            .filter(LotMonthlyRollup.year == year)\
+            .group_by(ParkingLot.parking_name, LotMonthlyRollup.month)\
+            .order_by(LotMonthlyRollup.month).all()
             # Group total complete_booking & active_booking user wise
             booking_status_user_wise = db.session.query(
                 User.username,
-                func.sum(case((ReserveParkingLot.is_release == True, 1), else_=0)).label('complete_booking'),
-                func.sum(case((ReserveParkingLot.is_release == False, 1), else_=0)).label('active_booking')
-            ).join(User, User.id == ReserveParkingLot.user_id)\
+                func.sum(UserMonthlyRollup.complete_booking).label('complete_booking'),
+                func.sum(UserMonthlyRollup.active_booking).label('active_booking')
+            ).join(User, User.id == UserMonthlyRollup.user_id)\
             .group_by(User.username).all()
             # Group total monthly spends user wise
             user_monthly_spends = db.session.query(
                 User.username,
-                extract('month', ReserveParkingLot.in_time).label('month'),
-                func.sum(ReserveParkingLot.total_cost).label('monthly_earning')
-            ).join(User, User.id == ReserveParkingLot.user_id)\
-            .filter(ReserveParkingLot.is_release == True)\
-            .group_by(User.username, 'month')\
-            .order_by('month').all()
+                UserMonthlyRollup.month,
+                func.sum(UserMonthlyRollup.spend).label('monthly_earning')
+            ).join(User, User.id == UserMonthlyRollup.user_id)\
+            .filter(UserMonthlyRollup.year == year)\
+            .group_by(User.username, UserMonthlyRollup.month)\
+            .order_by(UserMonthlyRollup.month).all()
         else:
+            # The user's bookings in the hot table & the archive
+            reservations = archive.history()
             # Total complete_booking & active_booking lot wise for specific user
             booking_status_lot_wise = db.session.query(
                 ParkingLot.parking_name,
-                func.sum(case((ReserveParkingLot.is_release == True, 1), else_=0)).label('complete_booking'),
-                func.sum(case((ReserveParkingLot.is_release == False, 1), else_=0)).label('active_booking')
-            ).join(ParkingSpot, ParkingSpot.id == ReserveParkingLot.spot_id)\
+                func.sum(case((reservations.is_release == True, 1), else_=0)).label('complete_booking'),
+                func.sum(case((reservations.is_release == False, 1), else_=0)).label('active_booking')
+            ).join(ParkingSpot, ParkingSpot.id == reservations.spot_id)\
             .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
-            .join(User, User.id == ReserveParkingLot.user_id)\
-            .filter(ReserveParkingLot.user_id == session['user_id'])\
+            .filter(reservations.user_id == session['user_id'])\
             .group_by(ParkingLot.parking_name).all()
             # Total monthly spends lot wise for specific user
             lot_monthly_collection = db.session.query(
                 ParkingLot.parking_name,
-                extract('month', ReserveParkingLot.out_time).label('month'),
-                func.sum(ReserveParkingLot.total_cost).label('monthly_earning')
-            ).join(ParkingSpot, ParkingSpot.id == ReserveParkingLot.spot_id)\
+                extract('month', reservations.out_time).label('month'),
+                func.sum(reservations.total_cost).label('monthly_earning')
+            ).join(ParkingSpot, ParkingSpot.id == reservations.spot_id)\
             .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)\
-            .filter(ReserveParkingLot.is_release == True, ReserveParkingLot.user_id == session['user_id'])\
+            .filter(reservations.is_release == True, reservations.user_id == session['user_id'])\
+            .filter(extract('year', reservations.out_time) == year)\
             .group_by(ParkingLot.parking_name, 'month')\
             .order_by('month').all()
             # Total complete_booking & active_booking for specific user
             booking_status_user_wise = db.session.query(
                 User.username,
-                func.sum(case((ReserveParkingLot.is_release == True, 1), else_=0)).label('complete_booking'),
-                func.sum(case((ReserveParkingLot.is_release == False, 1), else_=0)).label('active_booking')
-            ).join(User, User.id == ReserveParkingLot.user_id)\
-            .filter(ReserveParkingLot.user_id == session['user_id'])
+                func.sum(UserMonthlyRollup.complete_booking).label('complete_booking'),
+                func.sum(UserMonthlyRollup.active_booking).label('active_booking')
+            ).join(User, User.id == UserMonthlyRollup.user_id)\
+            .filter(UserMonthlyRollup.user_id == session['user_id'])\
+            .group_by(User.username).all()
             # Total monthly spends for specific user
             user_monthly_spends = db.session.query(
                 User.username,
-                extract('month', ReserveParkingLot.in_time).label('month'),
-                func.sum(ReserveParkingLot.total_cost).label('monthly_earning')
-            ).join(User, User.id == ReserveParkingLot.user_id)\
-            .filter(ReserveParkingLot.is_release == True, ReserveParkingLot.user_id == session['user_id'])\
-            .order_by('month').all()
+                UserMonthlyRollup.month,
+                UserMonthlyRollup.spend.label('monthly_earning')
+            ).join(User, User.id == UserMonthlyRollup.user_id)\
+            .filter(UserMonthlyRollup.user_id == session['user_id'], UserMonthlyRollup.year == year)\
+            .order_by(UserMonthlyRollup.month).all()
 
         # Lot-wise data
         lot_booking_dict = defaultdict(lambda: {'complete': 0, 'active': 0})
@@ -518,7 +606,8 @@ def init_routes(app):
             lot_booking_dict=lot_booking_dict,
             lot_monthly_dict=lot_monthly_dict,
             user_booking_dict=user_booking_dict,
-            user_monthly_dict=user_monthly_dict
+            user_monthly_dict=user_monthly_dict,
+            year=year
         )
 
     # <----------------------------------------------------------Update---------------------------------------------------------->
@@ -541,13 +630,17 @@ def init_routes(app):
             return redirect(url_for('profile'))
         # Check for user password change, if yes then update
         if old_password and new_password:
-            if not check_password_hash(user.passhash, old_password):
-                flash('Invalid old password')
-                return redirect(url_for('profile'))
-            if len(new_password) < 5 or old_password == new_password:
-                flash('New password must be at least 5 characters long and different from old password')
+            try:
+                if not passwords.verify_password(user.passhash, old_password):
+                    flash('Invalid old password')
+                    return redirect(url_for('profile'))
+                if len(new_password) < 5 or old_password == new_password:
+                    flash('New password must be at least 5 characters long and different from old password')
+                    return redirect(url_for('profile'))
+                passhash = passwords.hash_password(new_password)
+            except passwords.PasswordBusy:
+                flash('Server is busy, please try again')
                 return redirect(url_for('profile'))
-            passhash = generate_password_hash(new_password)
             user.passhash = passhash
         # Check for username change, if yes then update
         if username != user.username:
@@ -565,6 +658,8 @@ def init_routes(app):
         if pincode != user.pincode:
             user.pincode = pincode
         db.session.commit()
+        # Drop the cached copy so the next request sees the update
+        cache.invalidate_user(user.id)
         flash('Profile updated successfully')
         return redirect(url_for('profile'))
     
@@ -593,33 +688,18 @@ def init_routes(app):
             lot.number_of_spots = new_spot_count
             db.session.flush() # Flush to ensure the lot is updated in ParkingLot table before updating the spots in ParkingSpot table 
             # Calculate the difference of new & old spot to decide to dec or inc the spot quantity
-            spot_diff = new_spot_count - current_spots_count
-            # Check if diff in +ve need to inc the spots
-            if spot_diff > 0:
-                # First try to reactivate soft-deleted spots
-                deactivated_spots = ParkingSpot.query.filter_by(lot_id=lot_id, deleted_spot=True).limit(spot_diff).all()
-                for spot in deactivated_spots:
-                    spot.deleted_spot = False
-                spot_diff -= len(deactivated_spots)
-                # If more spots are still needed, create new ones
-                if spot_diff > 0:
-                    last_spot_number = ParkingSpot.query.filter_by(lot_id=lot_id).count()
-                    new_spots = [
-                        ParkingSpot(
-                            lot_id=lot_id,
-                            spot_number='P{:03d}'.format(last_spot_number + i + 1),
-                            occupied=False
-                        ) for i in range(spot_diff)
-                    ]
-                    db.session.add_all(new_spots)
-            # Check if diff in -ve need to dec the spots
-            elif spot_diff < 0:
-                # Soft-delete excess unoccupied spots (highest spot numbers first)
-                spots_to_remove = ParkingSpot.query.filter_by(lot_id=lot_id, occupied=False, deleted_spot=False).order_by(ParkingSpot.spot_number.desc()).limit(abs(spot_diff)).all()
-                for spot in spots_to_remove:
-                    spot.deleted_spot = True
+            # (reactivate/create spots when +ve, soft-delete free spots with highest numbers when -ve)
+            provisioning.resize(lot, new_spot_count - current_spots_count)
+            # Recount the lot occupancy counters in the same transaction
+            occupancy.refresh(lot_id)
             # Commit the changes if all run successfully
             db.session.commit()
+            # Spots are added or removed, rebuild the free spot heap on next booking
+            allocator.invalidate(lot_id)
+            cache.invalidate_lot(lot_id)
+            cache.invalidate_spots(lot_id)
+            eventlog.lot_resized(lot_id, new_spot_count - current_spots_count)
+            events.publish_lots([lot_id])
             flash('Parking lot updated successfully')
             return redirect(url_for('home'))
         # Rollback the changes if process failed in middle
@@ -632,21 +712,42 @@ def init_routes(app):
     @app.route('/release_spot/<int:booking_id>', methods=['POST'])
     @login_auth
     def release_spot(booking_id):
-        # Get the user booking details from pre-filled Form in booking_detail page
-        out_time_str = request.form.get('out_time')
-        out_time = datetime.strptime(out_time_str, "%Y-%m-%d %H:%M:%S")
-        hours = int(request.form.get('hours'))
-        total_cost = float(request.form.get('total_cost'))
-        # Update the value in ReserveParkingLot table
-        booking = ReserveParkingLot.query.filter_by(id=booking_id).first()
-        booking.is_release = True
-        booking.parking_spot.occupied = False
-        booking.out_time = out_time
-        booking.hours = hours
-        booking.total_cost = total_cost
-        db.session.commit()
+        # Only an open booking of the user (admins may release any booking, same as the API)
+        booking = ReserveParkingLot.query.filter_by(id=booking_id, is_release=False)
+        if not session['isadmin']:
+            booking = booking.filter_by(user_id=session['user_id'])
+        booking = booking.first()
+        if booking is None:
+            flash('Booking not found or already released')
+            return redirect(url_for('booking_history'))
+        # Charge & release the booking (hours & total_cost shown in the form are not trusted)
+        if not bookings.release(booking):
+            flash('Booking is already released')
         return redirect(url_for('booking_history'))
     
+    # <-------------------Settle Open Bookings-------------------->
+    @app.route('/settle', methods=['POST'])
+    @login_auth
+    def settle():
+        if not session['isadmin']:
+            flash('Only admin can settle bookings')
+            return redirect(url_for('home'))
+        lot_ids = request.form.getlist('lot_id', type=int)
+        if not lot_ids:
+            flash('Select the parking lots to settle')
+            return redirect(url_for('home'))
+        try:
+            # Release & charge every open booking of the lots in one transaction
+            start = time.perf_counter()
+            settled = bookings.settle(lot_ids)
+            elapsed = time.perf_counter() - start
+            flash(f"Settled {settled} booking(s) in {elapsed:.2f}s ({settled / elapsed:.0f} bookings/sec)")
+        # Rollback the changes if process failed in middle
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Error settling bookings: {e}")
+        return redirect(url_for('home'))
+    
     # <----------------------------------------------------------Delete---------------------------------------------------------->
     
     # <-------------------------Delete Lot------------------------>
@@ -658,12 +759,20 @@ def init_routes(app):
             # Soft detlete the lot
             lot.deleted_lot = True
             # Soft detlete the each slot in a lot
+            removed_spots = 0
             for spot in lot.parking_spot:
                 if spot.occupied:
                     raise Exception
+                removed_spots += not spot.deleted_spot
                 spot.deleted_spot = True
+            occupancy.refresh(lot_id)
             # Commit the changes
             db.session.commit()
+            allocator.invalidate(lot_id)
+            cache.invalidate_lot(lot_id)
+            cache.invalidate_spots(lot_id)
+            eventlog.lot_resized(lot_id, -removed_spots)
+            events.publish_lots([lot_id])
             flash(f"Parking lot '{lot.parking_name}' deleted successfully")
         # Rollback the changes if process failed in middle
         except Exception as e:
@@ -675,16 +784,39 @@ def init_routes(app):
     @app.route('/delete_spot/<int:spot_id>', methods=['POST'])
     @login_auth
     def delete_spot(spot_id):
+        # Fetch spot detail from database
+        spot = db.session.get(ParkingSpot, spot_id)
+        if spot is None:
+            flash('Spot not found')
+            return redirect(url_for('home'))
+        spot_number = spot.spot_number
+        lot_id = spot.lot_id
         try:
-            # Fetch spot detail from database
-            spot = ParkingSpot.query.get(spot_id)
-            spot_number = spot.spot_number
-            lot_id = spot.lot_id
-            # Soft delete by update deleted_spot to true
-            spot.deleted_spot = True
+            # Soft delete only a free spot that is not deleted yet, in one conditional UPDATE
+            # (a booking or a second delete of the same spot may have won the race)
+            result = db.session.execute(
+                update(ParkingSpot)
+                .where(ParkingSpot.id == spot_id, ParkingSpot.occupied == False, ParkingSpot.deleted_spot == False)
+                .values(deleted_spot=True)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                flash(f'{spot_number} spot is occupied or already deleted')
+                return redirect(url_for('show_spot', lot_id=lot_id))
             # Dec the number_of_spots by 1
-            spot.parking_lot.number_of_spots -= 1
+            db.session.execute(
+                update(ParkingLot).where(ParkingLot.id == lot_id).values(number_of_spots=ParkingLot.number_of_spots - 1)
+                .execution_options(synchronize_session=False)
+            )
+            occupancy.refresh(lot_id)
             db.session.commit()
+            allocator.invalidate(lot_id)
+            # number_of_spots of the lot changed too
+            cache.invalidate_lot(lot_id)
+            cache.invalidate_spots(lot_id)
+            eventlog.spot_deleted(lot_id, spot_id)
+            events.publish_lots([lot_id])
             flash(f'{spot_number} spot successfully deleted')
             return redirect(url_for('show_spot', lot_id=lot_id))
         # Rollback the changes if process failed in middle
@@ -705,6 +837,7 @@ def init_routes(app):
             if not active_reservations:
                 user.deleted_user = True
                 db.session.commit()
+                cache.invalidate_user(user.id)
                 flash(f"User '{user.username}' deleted successfully")
             else:
                 flash(f"User '{user.username}' could not be deleted because active reservations exist.")
@@ -0,0 +1,93 @@
+import re
+from sqlalchemy import select, table, column, literal_column, or_, cast, String, inspect, false
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveParkingLot
+
+# FTS5 virtual tables (created & kept in sync by triggers in models/migrations.py)
+lot_search = table('lot_search', column('rowid'), column('rank'))
+user_search = table('user_search', column('rowid'), column('rank'))
+reservation_search = table('reservation_search', column('rowid'), column('rank'))
+
+_enabled = {}
+
+# <--------------------Check FTS Tables Exist-------------------->
+def enabled():
+    """Full-text search is used on SQLite once the search tables exist, otherwise fall back to ilike."""
+    engine = db.engine
+    if engine.url not in _enabled:
+        _enabled[engine.url] = engine.dialect.name == 'sqlite' and inspect(engine).has_table('reservation_search')
+    return _enabled[engine.url]
+
+# <--------------------Build FTS5 Query-------------------->
+def match_query(search_query, column_name=None):
+    """Turn the search box text into an FTS5 prefix query: every word must match the start of a token."""
+    words = re.findall(r'\w+', search_query)
+    prefix = f'{column_name} : ' if column_name else ''
+    return ' '.join(f'{prefix}"{word}"*' for word in words)
+
+def _matches(fts_table, search_query, column_name=None):
+    return select(fts_table.c.rowid, fts_table.c.rank)\
+        .where(literal_column(fts_table.name).op('MATCH')(match_query(search_query, column_name)))
+
+# <--------------------Search Parking Lots-------------------->
+def filter_lots(lots_query, search_query):
+    if not enabled():
+        return lots_query.filter(
+            or_(
+                ParkingLot.parking_name.ilike(f"%{search_query}%"),
+                ParkingLot.city.ilike(f"%{search_query}%"),
+                ParkingLot.address.ilike(f"%{search_query}%"),
+                cast(ParkingLot.pincode, String).ilike(f"%{search_query}%")
+            )
+        )
+    if not match_query(search_query):
+        return lots_query.filter(false())
+    # Best matching lots first
+    matches = _matches(lot_search, search_query).subquery()
+    return lots_query.join(matches, matches.c.rowid == ParkingLot.id).order_by(matches.c.rank)
+
+# <--------------------Search Users-------------------->
+def filter_users(users_query, search_query):
+    if not enabled():
+        return users_query.filter(
+            or_(
+                User.username.ilike(f"%{search_query}%"),
+                User.name.ilike(f"%{search_query}%"),
+                User.city.ilike(f"%{search_query}%"),
+                cast(User.pincode, String).ilike(f"%{search_query}%")
+            )
+        )
+    if not match_query(search_query):
+        return users_query.filter(false())
+    # users_list pages by id, so matches keep the id order
+    return users_query.filter(User.id.in_(_matches(user_search, search_query).with_only_columns(user_search.c.rowid)))
+
+# <--------------------Search Reservations-------------------->
+def filter_reservations(bookings_query, search_query, model=ReserveParkingLot):
+    """Filter a ReserveParkingLot (or ArchivedReservation `model`) query, already joined with
+    User, ParkingSpot & ParkingLot, by vehicle number, username, lot details or spot number."""
+    if not enabled():
+        return bookings_query.filter(
+            or_(
+                model.vehicle_number.ilike(f"{search_query}%"),
+                User.username.ilike(f"%{search_query}%"),
+                ParkingLot.parking_name.ilike(f"%{search_query}%"),
+                ParkingLot.city.ilike(f"%{search_query}%"),
+                ParkingLot.address.ilike(f"%{search_query}%"),
+                cast(ParkingSpot.spot_number, String).ilike(f"%{search_query}%"),
+                cast(ParkingLot.pincode, String).ilike(f"%{search_query}%")
+            )
+        )
+    if not match_query(search_query):
+        return bookings_query.filter(false())
+    # Each branch is served by an index, so the cost follows the matches and not the history size
+    by_vehicle = _matches(reservation_search, search_query).with_only_columns(reservation_search.c.rowid.label('id'))
+    by_user = select(model.id).where(model.user_id.in_(
+        _matches(user_search, search_query, 'username').with_only_columns(user_search.c.rowid)))
+    by_spot = select(model.id).where(model.spot_id.in_(
+        select(ParkingSpot.id).where(or_(
+            ParkingSpot.lot_id.in_(_matches(lot_search, search_query).with_only_columns(lot_search.c.rowid)),
+            ParkingSpot.spot_number.ilike(f"%{search_query}%")
+        ))))
+    # Join (not IN) so SQLite drives the query from the matches instead of scanning by is_release
+    matches = by_vehicle.union(by_user, by_spot).subquery()
+    return bookings_query.join(matches, matches.c.id == model.id)
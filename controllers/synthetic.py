@@ -0,0 +1,194 @@
+import math
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from models.models import db, User, ParkingLot, ParkingSpot, ReserveParkingLot, ArchivedReservation
+from controllers import occupancy, rollups, search, passwords, eventlog, provisioning
+
+# Synthetic users, lots, spots & bookings for scale testing (`flask generate-data`)
+
+CITIES = [('Delhi', '110001', 'DL'), ('Mumbai', '400001', 'MH'), ('Bengaluru', '560001', 'KA'), ('Chennai', '600001', 'TN'),
+          ('Hyderabad', '500001', 'TS'), ('Kolkata', '700001', 'WB'), ('Pune', '411001', 'MH'), ('Jaipur', '302001', 'RJ')]
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Saanvi', 'Arjun', 'Priya', 'Rahul', 'Neha', 'Karan', 'Pooja']
+LAST_NAMES = ['Sharma', 'Verma', 'Patel', 'Reddy', 'Iyer', 'Khan', 'Singh', 'Gupta', 'Nair', 'Das', 'Mehta', 'Joshi']
+STREETS = ['MG Road', 'Station Road', 'Ring Road', 'Mall Road', 'Park Street', 'Market Lane', 'Airport Road', 'Tech Park']
+# Arrivals per hour of day: morning & evening peaks, quiet nights
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 12, 14, 11, 9, 9, 8, 7, 7, 8, 11, 13, 10, 7, 5, 3, 2]
+# Parked time is log-normal: median 2 hours, a long tail of all day & overnight stays
+DWELL_MEDIAN_MINUTES = 120
+DWELL_SIGMA = 0.9
+DWELL_MAX_MINUTES = 72 * 60
+# Row-by-row upkeep suspended while generating, rebuilt in bulk afterwards: the full-text triggers
+# (~5x slower inserts) & the reservation indexes (random B-tree inserts)
+SUSPENDED = ("SELECT name, type, sql FROM sqlite_master WHERE sql IS NOT NULL AND ((type = 'trigger' AND name IN "
+             "('user_search_insert', 'reservation_search_insert')) OR (type = 'index' AND tbl_name = 'reserve_parking_lot'))")
+SEARCH_INDEX = [
+    'INSERT INTO user_search (rowid, username, name, city, pincode) SELECT id, username, name, city, pincode FROM user WHERE id >= :user_id',
+    'INSERT INTO reservation_search (rowid, vehicle_number) SELECT id, vehicle_number FROM reserve_parking_lot WHERE id >= :booking_id',
+]
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+def _next_booking_id():
+    # Archived bookings keep their ids, new ones continue after both tables
+    return max(_next_id(ReserveParkingLot), _next_id(ArchivedReservation))
+
+def _skewed(count, exponent):
+    # Cumulative Zipf-like weights: a few lots & regular parkers take most of the bookings
+    cumulative, total = [], 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+def _plate(state, user_id):
+    # One vehicle per user, distinct for every user id: 'MH 12 AB 1234'
+    letters = user_id // 10000
+    return f"{state} {letters // 676 % 100:02d} {chr(65 + letters // 26 % 26)}{chr(65 + letters % 26)} {user_id % 10000:04d}"
+
+# <--------------------Bulk Load Mode-------------------->
+def _suspend_upkeep():
+    # Drop the triggers & indexes, return their SQL to recreate them
+    if db.engine.dialect.name != 'sqlite':
+        return []
+    schema = db.session.execute(text(SUSPENDED)).all()
+    for name, kind, _ in schema:
+        db.session.execute(text(f'DROP {kind.upper()} {name}'))
+    db.session.commit()
+    return [statement for _, _, statement in schema]
+
+def _resume_upkeep(schema, first_user, first_booking):
+    # Index every row written meanwhile, then put the indexes & triggers back
+    if not schema:
+        return
+    # Drop a batch left pending by an error, the committed ones are indexed
+    db.session.rollback()
+    if search.enabled():
+        for statement in SEARCH_INDEX:
+            db.session.execute(text(statement), {'user_id': first_user, 'booking_id': first_booking})
+    for statement in schema:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+# <--------------------Generate Data-------------------->
+def generate(users, lots, spots_per_lot, reservations, seed=42, days=365, open_share=0.3, password='password',
+             as_of=None, batch_size=50000):
+    """Append synthetic rows with bulk executemany inserts & a commit per batch, return {table: rows written}.
+
+    The rows only depend on `seed`, `as_of` (default: the current hour) and the ids already
+    in the database, so runs on copies of the same database are comparable. Every user gets
+    the same `password` (hashed once). `open_share` of the new spots hold an open booking.
+    Call rebuild() afterwards for the occupancy counters & dashboard rollups.
+    """
+    rng = random.Random(seed)
+    as_of = as_of or datetime.now().replace(minute=0, second=0, microsecond=0)
+    written = {}
+
+    def insert(sql, rows):
+        # One executemany per batch, committed so a huge run never holds one giant transaction
+        for start in range(0, len(rows), batch_size):
+            db.session.connection().exec_driver_sql(sql, rows[start:start + batch_size])
+            db.session.commit()
+
+    first_user, first_booking = _next_id(User), _next_booking_id()
+    schema = _suspend_upkeep()
+    try:
+        # <-----Users----->
+        passhash = passwords.hash_password(password)
+        user_cities = [rng.randrange(len(CITIES)) for _ in range(users)]
+        insert('INSERT INTO user (id, username, passhash, name, city, pincode, isadmin, deleted_user) VALUES (?, ?, ?, ?, ?, ?, 0, 0)', [
+            (user_id, f'user{user_id}', passhash, f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', CITIES[city][0], CITIES[city][1])
+            for user_id, city in zip(range(first_user, first_user + users), user_cities)
+        ])
+        written['user'] = users
+
+        # <-----Lots & spots----->
+        first_lot, first_spot = _next_id(ParkingLot), _next_id(ParkingSpot)
+        lot_rows, spot_rows, lot_spots, prices = [], [], [], []
+        spot_id = first_spot
+        for lot_id in range(first_lot, first_lot + lots):
+            city, pincode, _ = CITIES[rng.randrange(len(CITIES))]
+            size = max(1, rng.randint(spots_per_lot // 2, spots_per_lot * 3 // 2))
+            price = float(rng.randrange(20, 110, 10))
+            lot_rows.append((lot_id, f'{city} Lot {lot_id}', f'{rng.randint(1, 400)} {rng.choice(STREETS)}', city, pincode, price, size, size))
+            lot_spots.append(range(spot_id, spot_id + size))
+            prices.append(price)
+            spot_id += size
+        open_spots = set(rng.sample(range(first_spot, spot_id), min(int((spot_id - first_spot) * open_share), users)))
+        for lot_id, spots in zip(range(first_lot, first_lot + lots), lot_spots):
+            spot_rows += [(spot, lot_id, provisioning.spot_number(number), int(spot in open_spots)) for number, spot in enumerate(spots, start=1)]
+        insert('INSERT INTO parking_lot (id, parking_name, address, city, pincode, price, number_of_spots, deleted_lot, last_spot_number) '
+               'VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)', lot_rows)
+        insert('INSERT INTO parking_spot (id, lot_id, spot_number, occupied, deleted_spot) VALUES (?, ?, ?, ?, 0)', spot_rows)
+        written['parking_lot'], written['parking_spot'] = lots, len(spot_rows)
+
+        # <-----Released bookings----->
+        # Datetimes are joined from precomputed day & time of day strings, strftime on every row is too slow.
+        # The days start a little early for bookings moved back to end before as_of
+        end = as_of.timestamp()
+        base = datetime.fromtimestamp(end - (days + 3) * 86400).replace(hour=0, minute=0, second=0)
+        base_epoch = base.timestamp()
+        day_prefix = [(base + timedelta(days=day)).strftime('%Y-%m-%d ') for day in range(days + 8)]
+        time_of_day = [f'{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.000000' for second in range(86400)]
+        def stamp(epoch):
+            seconds = int(epoch - base_epoch)
+            return day_prefix[seconds // 86400] + time_of_day[seconds % 86400]
+
+        user_weights, lot_weights = _skewed(users, 0.6), _skewed(lots, 0.8)
+        lot_order = list(range(lots))
+        rng.shuffle(lot_order)
+        hour_weights = list(accumulate(HOUR_WEIGHTS))
+        mu = math.log(DWELL_MEDIAN_MINUTES)
+        uniform, gauss = rng.random, rng.gauss
+        # (vehicle_number, plate) of every user
+        vehicles = [(vehicle_number, vehicle_number.replace(' ', '')) for vehicle_number in
+                    (_plate(CITIES[city][2], user_id) for user_id, city in zip(range(first_user, first_user + users), user_cities))]
+        sql = ('INSERT INTO reserve_parking_lot (id, user_id, spot_id, in_time, out_time, hours, total_cost, vehicle_number, plate, is_release) '
+               'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)')
+        booking_id = first_booking
+        for start in range(0, reservations, batch_size):
+            count = min(batch_size, reservations - start)
+            user_picks = rng.choices(range(users), cum_weights=user_weights, k=count)
+            lot_picks = rng.choices(lot_order, cum_weights=lot_weights, k=count)
+            hour_picks = rng.choices(range(24), cum_weights=hour_weights, k=count)
+            rows = []
+            for user_index, lot_index, hour in zip(user_picks, lot_picks, hour_picks):
+                # uniform() arithmetic instead of randrange() & lognormvariate(), about 2x faster per row
+                dwell = min(DWELL_MAX_MINUTES, max(5, math.exp(gauss(mu, DWELL_SIGMA)))) * 60
+                in_epoch = base_epoch + (3 + int(uniform() * days)) * 86400 + hour * 3600 + int(uniform() * 3600)
+                if in_epoch + dwell > end:
+                    in_epoch -= math.ceil((in_epoch + dwell - end) / 86400) * 86400
+                spots = lot_spots[lot_index]
+                hours = math.ceil(dwell / 3600)
+                user_id = first_user + user_index
+                rows.append((booking_id, user_id, spots[int(uniform() * len(spots))], stamp(in_epoch), stamp(in_epoch + dwell),
+                             hours, prices[lot_index] * hours, *vehicles[user_index]))
+                booking_id += 1
+            db.session.connection().exec_driver_sql(sql, rows)
+            db.session.commit()
+        written['reserve_parking_lot'] = reservations
+
+        # <-----Open bookings (one per occupied spot, one per vehicle)----->
+        open_users = rng.sample(range(users), len(open_spots))
+        open_rows = []
+        for spot, user_index in zip(sorted(open_spots), open_users):
+            user_id = first_user + user_index
+            open_rows.append((booking_id, user_id, spot, stamp(end - rng.randrange(300, 10 * 3600)), *vehicles[user_index]))
+            booking_id += 1
+        insert('INSERT INTO reserve_parking_lot (id, user_id, spot_id, in_time, vehicle_number, plate, is_release) VALUES (?, ?, ?, ?, ?, ?, 0)', open_rows)
+        written['reserve_parking_lot'] += len(open_rows)
+    finally:
+        _resume_upkeep(schema, first_user, first_booking)
+    return written
+
+# <--------------------Rebuild Derived Tables-------------------->
+def rebuild():
+    """Recount occupancy, rebuild the dashboard rollups, event log snapshot & planner statistics after generate()."""
+    occupancy.reconcile()
+    # The generated rows have no events, the event log starts from their state
+    eventlog.baseline()
+    rollups.backfill()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
@@ -0,0 +1,20 @@
+import multiprocessing
+import os
+
+# Bind on the same PORT as the development server
+bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
+
+# Worker processes x threads per worker, each thread holds at most one pooled connection
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 8))
+# Live screens (SSE streams) hold a thread each, so serve /occupancy/stream from a second gunicorn
+# behind the proxy with an async worker (WEB_WORKER_CLASS=gevent, `pip install gevent`) & a high STREAM_MAX_CLIENTS
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+# Every worker imports the app itself, so no database connection is shared across a fork
+preload_app = False
+
+# Longer than SQLITE_BUSY_TIMEOUT, so a request waiting for the write lock is not killed first
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+keepalive = 5
+accesslog = '-'
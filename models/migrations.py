@@ -0,0 +1,196 @@
+import os
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+from models.models import db, User, ReserveParkingLot
+
+# <--------------------Add a Column Only if Missing-------------------->
+def add_column(table, column, definition):
+    """Migration step adding a column, skipped on fresh databases where create_all already made it."""
+    def step():
+        columns = [row[1] for row in db.session.execute(text(f'PRAGMA table_info({table})'))]
+        if column not in columns:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+    return step
+
+# <--------------------Fill ReserveParkingLot.plate-------------------->
+def backfill_plates():
+    """Normalize every vehicle_number into plate. If a vehicle has several open bookings,
+    only the newest keeps its plate so the one-open-booking-per-plate index can be built."""
+    from controllers.plates import normalize
+    rows = db.session.execute(text('SELECT id, vehicle_number, is_release FROM reserve_parking_lot ORDER BY in_time DESC, id DESC'))
+    open_plates, params = set(), []
+    for booking_id, vehicle_number, is_release in rows:
+        plate = normalize(vehicle_number)
+        if plate and not is_release:
+            if plate in open_plates:
+                plate = None
+            open_plates.add(plate)
+        params.append({'plate': plate, 'id': booking_id})
+    if params:
+        db.session.execute(text('UPDATE reserve_parking_lot SET plate = :plate WHERE id = :id'), params)
+
+# <--------------------Fill the Dashboard Rollups-------------------->
+def backfill_rollups():
+    """Build the monthly rollups from the booking history of databases that predate them."""
+    from controllers.rollups import rebuild
+    rebuild()
+
+# <--------------------Recreate a Table With AUTOINCREMENT-------------------->
+def rebuild_autoincrement(model):
+    """Migration step recreating the model's table with AUTOINCREMENT, so a deleted row's id is never
+    reused. Skipped when the table already has it (fresh databases). Indexes are created from the
+    model, the table's triggers are put back as they were."""
+    def step():
+        table = model.__table__.name
+        sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"), {'table': table}).scalar()
+        if sql is None or 'AUTOINCREMENT' in sql.upper():
+            return
+        schema = db.session.execute(text("SELECT type, name, sql FROM sqlite_master WHERE tbl_name = :table AND type IN ('index', 'trigger') "
+                                         "AND sql IS NOT NULL"), {'table': table}).all()
+        for kind, name, _ in schema:
+            db.session.execute(text(f'DROP {kind.upper()} {name}'))
+        db.session.execute(text(f'ALTER TABLE {table} RENAME TO {table}_old'))
+        model.__table__.create(db.session.connection())
+        columns = ', '.join(column.name for column in model.__table__.columns)
+        db.session.execute(text(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old'))
+        db.session.execute(text(f'DROP TABLE {table}_old'))
+        for kind, _, statement in schema:
+            if kind == 'trigger':
+                db.session.execute(text(statement))
+    return step
+
+# Versioned schema changes for databases created before the change (db.create_all only
+# creates missing tables, it never adds indexes or columns to an existing table).
+# Each migration is (version, description, [SQL statements or add_column steps]) and must
+# be safe to run on a fresh database where create_all already built the latest schema.
+MIGRATIONS = [
+    (1, 'Indexes for hot filter columns', [
+        'CREATE INDEX IF NOT EXISTS ix_user_role_id ON user (isadmin, deleted_user, id)',
+        'CREATE INDEX IF NOT EXISTS ix_parking_lot_deleted ON parking_lot (deleted_lot)',
+        'CREATE INDEX IF NOT EXISTS ix_parking_spot_allocation ON parking_spot (lot_id, deleted_spot, occupied, spot_number)',
+        'CREATE INDEX IF NOT EXISTS ix_reserve_spot_release_in_time ON reserve_parking_lot (spot_id, is_release, in_time)',
+        'CREATE INDEX IF NOT EXISTS ix_reserve_user_release ON reserve_parking_lot (user_id, is_release)',
+        'CREATE INDEX IF NOT EXISTS ix_reserve_release_out_time ON reserve_parking_lot (is_release, out_time)',
+        'ANALYZE',
+    ]),
+    (2, 'Full-text search tables for lots, users & reservations', [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS lot_search USING fts5(parking_name, address, city, pincode)',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5(username, name, city, pincode)',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS reservation_search USING fts5(vehicle_number)',
+        # Index the existing rows
+        'INSERT INTO lot_search (rowid, parking_name, address, city, pincode) SELECT id, parking_name, address, city, pincode FROM parking_lot',
+        'INSERT INTO user_search (rowid, username, name, city, pincode) SELECT id, username, name, city, pincode FROM user',
+        'INSERT INTO reservation_search (rowid, vehicle_number) SELECT id, vehicle_number FROM reserve_parking_lot',
+        # Keep the search tables in sync on every write
+        """CREATE TRIGGER IF NOT EXISTS lot_search_insert AFTER INSERT ON parking_lot BEGIN
+            INSERT INTO lot_search (rowid, parking_name, address, city, pincode) VALUES (new.id, new.parking_name, new.address, new.city, new.pincode);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS lot_search_update AFTER UPDATE OF parking_name, address, city, pincode ON parking_lot BEGIN
+            DELETE FROM lot_search WHERE rowid = old.id;
+            INSERT INTO lot_search (rowid, parking_name, address, city, pincode) VALUES (new.id, new.parking_name, new.address, new.city, new.pincode);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS lot_search_delete AFTER DELETE ON parking_lot BEGIN
+            DELETE FROM lot_search WHERE rowid = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS user_search_insert AFTER INSERT ON user BEGIN
+            INSERT INTO user_search (rowid, username, name, city, pincode) VALUES (new.id, new.username, new.name, new.city, new.pincode);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS user_search_update AFTER UPDATE OF username, name, city, pincode ON user BEGIN
+            DELETE FROM user_search WHERE rowid = old.id;
+            INSERT INTO user_search (rowid, username, name, city, pincode) VALUES (new.id, new.username, new.name, new.city, new.pincode);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS user_search_delete AFTER DELETE ON user BEGIN
+            DELETE FROM user_search WHERE rowid = old.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS reservation_search_insert AFTER INSERT ON reserve_parking_lot BEGIN
+            INSERT INTO reservation_search (rowid, vehicle_number) VALUES (new.id, new.vehicle_number);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS reservation_search_update AFTER UPDATE OF vehicle_number ON reserve_parking_lot BEGIN
+            DELETE FROM reservation_search WHERE rowid = old.id;
+            INSERT INTO reservation_search (rowid, vehicle_number) VALUES (new.id, new.vehicle_number);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS reservation_search_delete AFTER DELETE ON reserve_parking_lot BEGIN
+            DELETE FROM reservation_search WHERE rowid = old.id;
+        END""",
+    ]),
+    (3, 'Spot number high-water mark per lot', [
+        add_column('parking_lot', 'last_spot_number', 'INTEGER NOT NULL DEFAULT 0'),
+        """UPDATE parking_lot SET last_spot_number = COALESCE(
+            (SELECT MAX(CAST(SUBSTR(spot_number, 2) AS INTEGER)) FROM parking_spot WHERE parking_spot.lot_id = parking_lot.id), 0)""",
+    ]),
+    (4, 'Normalized vehicle plate with one open booking per plate', [
+        add_column('reserve_parking_lot', 'plate', 'VARCHAR(32)'),
+        backfill_plates,
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_reserve_open_plate ON reserve_parking_lot (plate) WHERE is_release = 0',
+    ]),
+    (5, 'Occupancy snapshot the reservation event log starts from', [
+        # Lots existing before the event log start from their current spots (create_all made the tables)
+        """INSERT OR IGNORE INTO occupancy_snapshot (lot_id, occupied, spots, last_event_id)
+            SELECT lot_id, SUM(occupied AND NOT deleted_spot), SUM(NOT deleted_spot), 0 FROM parking_spot GROUP BY lot_id""",
+    ]),
+    (6, 'Booking ids are never reused once archived', [
+        rebuild_autoincrement(ReserveParkingLot),
+        # Continue after the archived ids too (a booking with the highest id may already be archived)
+        """UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM reserve_parking_lot_archive))
+            WHERE name = 'reserve_parking_lot'""",
+        """INSERT INTO sqlite_sequence (name, seq) SELECT 'reserve_parking_lot', MAX(id) FROM reserve_parking_lot_archive
+            HAVING MAX(id) IS NOT NULL AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'reserve_parking_lot')""",
+    ]),
+    (7, 'Dashboard rollups built from the existing booking history', [
+        # Bookings made since the rollup tables were created are counted again, the rebuild replaces them
+        backfill_rollups,
+    ]),
+    (8, 'Occupancy counters for lots created before the counters existed', [
+        # Lots without spots get a row too, so reads never have to count & store missing lots
+        """INSERT OR IGNORE INTO lot_occupancy (lot_id, occupied, available)
+            SELECT parking_lot.id, COALESCE(SUM(parking_spot.occupied AND NOT parking_spot.deleted_spot), 0),
+                   COALESCE(SUM(NOT parking_spot.occupied AND NOT parking_spot.deleted_spot), 0)
+            FROM parking_lot LEFT JOIN parking_spot ON parking_spot.lot_id = parking_lot.id
+            GROUP BY parking_lot.id""",
+    ]),
+]
+
+# <--------------------Read Applied Version-------------------->
+def current_version():
+    db.session.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    return db.session.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+# <--------------------Apply Pending Migrations-------------------->
+def upgrade():
+    """Apply every migration newer than the stored schema version and return the applied ones."""
+    applied = []
+    version = current_version()
+    for migration_version, description, statements in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement()
+                else:
+                    db.session.execute(text(statement))
+            db.session.execute(text('INSERT INTO schema_version (version) VALUES (:version)'), {'version': migration_version})
+            db.session.commit()
+        # Rollback the changes if migration failed in middle
+        except Exception:
+            db.session.rollback()
+            raise
+        applied.append((migration_version, description))
+    db.session.commit()
+    return applied
+
+# <--------------------Create Schema & Seed Admin-------------------->
+def seed_admin():
+    """Create the admin user if it doesn't exist, return True when it was created."""
+    if User.query.filter_by(isadmin=True).first():
+        return False
+    passhash = generate_password_hash(os.getenv('ADMIN_PASSWORD', 'admin'))
+    db.session.add(User(username='admin', passhash=passhash, name='Admin', city='Delhi', pincode=110043, isadmin=True))
+    db.session.commit()
+    return True
+
+def bootstrap():
+    """Create missing tables, apply pending migrations & seed the admin user. Safe to run again."""
+    db.create_all()
+    applied = upgrade()
+    return applied, seed_admin()
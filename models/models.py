@@ -13,6 +13,8 @@ class User(db.Model):
     isadmin = db.Column(db.Boolean, nullable = False, default = False)
     deleted_user = db.Column(db.Boolean, nullable = False, default = False)
     reserve_parking_lot = db.relationship('ReserveParkingLot', backref = 'user', lazy = True)
+    # users_list filter & keyset order
+    __table_args__ = (db.Index('ix_user_role_id', 'isadmin', 'deleted_user', 'id'),)
 
 class ParkingLot(db.Model):
     id = db.Column(db.Integer, primary_key = True)
@@ -23,27 +25,22 @@ class ParkingLot(db.Model):
     price = db.Column(db.Float, nullable = False)
     number_of_spots = db.Column(db.Integer, nullable = False)
     deleted_lot = db.Column(db.Boolean, nullable = False, default = False)
+    # Highest spot number ever given in this lot, new spots continue from here
+    last_spot_number = db.Column(db.Integer, nullable = False, default = 0)
     parking_spot = db.relationship('ParkingSpot', backref= 'parking_lot', lazy = True, cascade='all, delete')
+    # home page filter
+    __table_args__ = (db.Index('ix_parking_lot_deleted', 'deleted_lot'),)
 
 class ParkingSpot(db.Model):
     id = db.Column(db.Integer, primary_key = True)
     lot_id = db.Column(db.Integer, db.ForeignKey(ParkingLot.id), nullable = False)
-    spot_number = db.Column(db.String(6), nullable = False)
+    # 'P' & the spot's number in the lot (P001, ... P1200, up to P9999999)
+    spot_number = db.Column(db.String(8), nullable = False)
     occupied = db.Column(db.Boolean, nullable = False, default = False)
     deleted_spot = db.Column(db.Boolean, nullable = False, default = False)
     reserve_parking_lot = db.relationship('ReserveParkingLot', backref= 'parking_spot', lazy = True)
-
-     # Method to get the current user occupying the spot
-    def spot_detail(self,input):
-        # Find the most recent reservation where the spot is still occupied
-        latest_reservation = ReserveParkingLot.query.filter_by(spot_id=self.id, is_release=False).order_by(ReserveParkingLot.in_time.desc()).first()
-        if input == 'user_name':
-            return latest_reservation.user.name
-        if input == 'vehicle_number':
-            return latest_reservation.vehicle_number
-        if input == 'in_time':
-            return latest_reservation.in_time
-        return None
+    # Spot allocation, show_spot & occupancy counts filter lot wise
+    __table_args__ = (db.Index('ix_parking_spot_allocation', 'lot_id', 'deleted_spot', 'occupied', 'spot_number'),)
 
 class ReserveParkingLot(db.Model):
     id = db.Column(db.Integer, primary_key = True)
@@ -54,4 +51,94 @@ class ReserveParkingLot(db.Model):
     hours = db.Column(db.Integer , nullable = True)
     total_cost = db.Column(db.Float, nullable = True)
     vehicle_number = db.Column(db.String(32), nullable = False)
-    is_release = db.Column(db.Boolean, nullable = False, default = False)
\ No newline at end of file
+    # vehicle_number normalized by controllers.plates.normalize() (upper case letters & digits only)
+    plate = db.Column(db.String(32), nullable = True)
+    is_release = db.Column(db.Boolean, nullable = False, default = False)
+    __table_args__ = (
+        # Open booking of a vehicle, and at most one open booking per vehicle
+        db.Index('ux_reserve_open_plate', 'plate', unique=True, sqlite_where=db.text('is_release = 0'), postgresql_where=db.text('NOT is_release')),
+        # show_spot occupant lookup
+        db.Index('ix_reserve_spot_release_in_time', 'spot_id', 'is_release', 'in_time'),
+        # users_list booking stats & user's own bookings
+        db.Index('ix_reserve_user_release', 'user_id', 'is_release'),
+        # booking_history & dashboard released bookings
+        db.Index('ix_reserve_release_out_time', 'is_release', 'out_time'),
+        # Ids of bookings moved to the archive are never handed out again
+        {'sqlite_autoincrement': True},
+    )
+
+class ArchivedReservation(db.Model):
+    # Released reservations moved out of ReserveParkingLot by controllers.archive (same ids & columns),
+    # so the hot table only keeps open & recent bookings. Read by booking_history, the rollups & exports
+    __tablename__ = 'reserve_parking_lot_archive'
+    id = db.Column(db.Integer, primary_key = True)
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id), nullable = False)
+    spot_id = db.Column(db.Integer, db.ForeignKey(ParkingSpot.id), nullable = False)
+    in_time = db.Column(db.DateTime , nullable = False)
+    out_time = db.Column(db.DateTime , nullable = True)
+    hours = db.Column(db.Integer , nullable = True)
+    total_cost = db.Column(db.Float, nullable = True)
+    vehicle_number = db.Column(db.String(32), nullable = False)
+    plate = db.Column(db.String(32), nullable = True)
+    is_release = db.Column(db.Boolean, nullable = False, default = True)
+    user = db.relationship(User, lazy = True)
+    parking_spot = db.relationship(ParkingSpot, lazy = True)
+    __table_args__ = (
+        # booking_history newest first
+        db.Index('ix_archive_out_time', 'out_time'),
+        # user's own history & dashboard
+        db.Index('ix_archive_user_out_time', 'user_id', 'out_time'),
+        # history search by lot & spot
+        db.Index('ix_archive_spot', 'spot_id'),
+    )
+
+class LotOccupancy(db.Model):
+    # Materialized occupied & available spot counters of a lot (kept in sync by the routes)
+    lot_id = db.Column(db.Integer, db.ForeignKey(ParkingLot.id), primary_key = True)
+    occupied = db.Column(db.Integer, nullable = False, default = 0)
+    available = db.Column(db.Integer, nullable = False, default = 0)
+
+class LotMonthlyRollup(db.Model):
+    # Pre-aggregated bookings (by in_time month) & earnings (by out_time month) of a lot for the dashboard
+    lot_id = db.Column(db.Integer, db.ForeignKey(ParkingLot.id), primary_key = True)
+    year = db.Column(db.Integer, primary_key = True)
+    month = db.Column(db.Integer, primary_key = True)
+    complete_booking = db.Column(db.Integer, nullable = False, default = 0)
+    active_booking = db.Column(db.Integer, nullable = False, default = 0)
+    earning = db.Column(db.Float, nullable = False, default = 0)
+
+class UserMonthlyRollup(db.Model):
+    # Pre-aggregated bookings & spends (by in_time month) of a user for the dashboard
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key = True)
+    year = db.Column(db.Integer, primary_key = True)
+    month = db.Column(db.Integer, primary_key = True)
+    complete_booking = db.Column(db.Integer, nullable = False, default = 0)
+    active_booking = db.Column(db.Integer, nullable = False, default = 0)
+    spend = db.Column(db.Float, nullable = False, default = 0)
+
+class ReservationEvent(db.Model):
+    # Append-only log of occupancy changes (booked, released, spot_deleted, lot_resized), written in
+    # group commits by controllers.eventlog. Rows are never updated, compaction folds old ones into OccupancySnapshot
+    id = db.Column(db.Integer, primary_key = True)
+    kind = db.Column(db.String(16), nullable = False)
+    lot_id = db.Column(db.Integer, db.ForeignKey(ParkingLot.id), nullable = False)
+    spot_id = db.Column(db.Integer, nullable = True)
+    booking_id = db.Column(db.Integer, nullable = True)
+    user_id = db.Column(db.Integer, nullable = True)
+    occupied_delta = db.Column(db.Integer, nullable = False, default = 0)
+    spots_delta = db.Column(db.Integer, nullable = False, default = 0)
+    created_at = db.Column(db.DateTime, nullable = False)
+
+    __table_args__ = (
+        # Compaction cutoff by age
+        db.Index('ix_reservation_event_created_at', 'created_at'),
+        # Ids are never reused after compaction deleted the newest events (the snapshot refers to them)
+        {'sqlite_autoincrement': True},
+    )
+
+class OccupancySnapshot(db.Model):
+    # Occupied & active spots of a lot with every event up to last_event_id folded in
+    lot_id = db.Column(db.Integer, db.ForeignKey(ParkingLot.id), primary_key = True)
+    occupied = db.Column(db.Integer, nullable = False, default = 0)
+    spots = db.Column(db.Integer, nullable = False, default = 0)
+    last_event_id = db.Column(db.Integer, nullable = False, default = 0)
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.models import db, User, ParkingLot, LotOccupancy
+from controllers import eventlog, provisioning
+
+SPOTS = 5
+
+
+@pytest.fixture
+def parking(tmp_path):
+    """App with two drivers and one lot of SPOTS free spots, counters & event log in sync."""
+    app = create_app({
+        'AUTO_BOOTSTRAP': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'parking.db'}",
+        'SECRET_KEY': 'test',
+        'PASSWORD_WORKERS': 0,
+    })
+    with app.app_context():
+        for username in ('driver', 'other'):
+            db.session.add(User(username=username, passhash='-', name=username.title(), city='Delhi', pincode='110001'))
+        lot = ParkingLot(parking_name='Test Lot', address='MG Road', city='Delhi', pincode='110001', price=20.0, number_of_spots=SPOTS)
+        db.session.add(lot)
+        db.session.flush()
+        provisioning.add_spots(lot, SPOTS)
+        db.session.add(LotOccupancy(lot_id=lot.id, occupied=0, available=SPOTS))
+        db.session.commit()
+        eventlog.lot_resized(lot.id, SPOTS)
+        yield app
+
+
+@pytest.fixture
+def lot_id(parking):
+    return ParkingLot.query.one().id
+
+
+@pytest.fixture
+def users(parking):
+    return {user.username: user.id for user in User.query.filter(User.username.in_(('driver', 'other')))}
+
+
+@pytest.fixture
+def client(parking):
+    """Test client with a login(user_id, isadmin=False) helper."""
+    client = parking.test_client()
+
+    def login(user_id, isadmin=False):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['isadmin'] = isadmin
+            session['user_name'] = 'test'
+    client.login = login
+    return client
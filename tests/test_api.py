@@ -0,0 +1,46 @@
+from models.models import db, ReserveParkingLot
+from controllers import bookings
+
+
+def test_release_requires_authentication(parking, lot_id, users, client):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    assert client.post(f'/api/v1/bookings/{booking.id}/release').status_code == 401
+    assert client.post(f'/api/v1/bookings/{booking.id}/release', headers={'X-API-Key': 'wrong'}).status_code == 401
+
+
+def test_release_of_foreign_booking_is_forbidden(parking, lot_id, users, client):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    client.login(users['other'])
+    response = client.post(f'/api/v1/bookings/{booking.id}/release')
+    assert response.status_code == 403
+    db.session.expire_all()
+    assert not db.session.get(ReserveParkingLot, booking.id).is_release
+    assert client.post('/api/v1/bookings/9999/release').status_code == 404
+
+
+def test_owner_releases_once(parking, lot_id, users, client):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    client.login(users['driver'])
+    response = client.post(f'/api/v1/bookings/{booking.id}/release')
+    assert response.status_code == 200
+    assert response.get_json()['is_release']
+    assert client.post(f'/api/v1/bookings/{booking.id}/release').status_code == 409
+
+
+def test_book_same_vehicle_twice(parking, lot_id, users, client):
+    client.login(users['driver'])
+    response = client.post(f'/api/v1/lots/{lot_id}/bookings', json={'vehicle_number': 'DL 01 AB 1234'})
+    assert response.status_code == 201
+    response = client.post(f'/api/v1/lots/{lot_id}/bookings', json={'vehicle_number': 'DL 01 AB 1234'})
+    assert response.status_code == 409
+
+
+def test_release_route_rejects_foreign_booking(parking, lot_id, users, client):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    client.login(users['other'])
+    for booking_id in (booking.id, 9999):
+        response = client.post(f'/release_spot/{booking_id}', follow_redirects=True)
+        assert response.status_code == 200
+        assert 'Booking not found or already released' in response.get_data(as_text=True)
+    db.session.expire_all()
+    assert not db.session.get(ReserveParkingLot, booking.id).is_release
@@ -0,0 +1,51 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.models import db, User, ParkingLot, LotOccupancy, ReserveParkingLot, ArchivedReservation
+from controllers import archive, bookings, provisioning
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'AUTO_BOOTSTRAP': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'archive.db'}",
+        'SECRET_KEY': 'test',
+        'PASSWORD_WORKERS': 0,
+    })
+    with app.app_context():
+        db.session.add(User(username='driver', passhash='-', name='Driver', city='Delhi', pincode='110001'))
+        lot = ParkingLot(parking_name='Archive Lot', address='MG Road', city='Delhi', pincode='110001', price=20.0, number_of_spots=3)
+        db.session.add(lot)
+        db.session.flush()
+        provisioning.add_spots(lot, 3)
+        db.session.add(LotOccupancy(lot_id=lot.id, occupied=0, available=3))
+        db.session.commit()
+        yield app
+
+
+def test_book_after_archiving_everything(app):
+    user_id = User.query.filter_by(username='driver').one().id
+    lot_id = ParkingLot.query.one().id
+    booked = []
+    for vehicle_number in ('DL 01 AB 1234', 'DL 01 AB 5678'):
+        booking = bookings.book(user_id, lot_id, vehicle_number)
+        booked.append(booking.id)
+        assert bookings.release(booking)
+
+    # The booking with the highest id is archived too
+    assert archive.archive_batch(datetime.now() + timedelta(seconds=1), 100) == 2
+    assert ReserveParkingLot.query.count() == 0
+    assert sorted(row.id for row in ArchivedReservation.query) == booked
+
+    booking = bookings.book(user_id, lot_id, 'DL 01 AB 1234')
+    assert booking.id > max(booked)
+    assert bookings.release(booking)
+    assert archive.archive_batch(datetime.now() + timedelta(seconds=1), 100) == 1
+    assert ArchivedReservation.query.count() == 3
@@ -0,0 +1,130 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from models.models import db, ParkingLot, ParkingSpot, ReserveParkingLot
+from controllers import billing, bookings, eventlog, occupancy
+from controllers.allocator import allocator
+
+
+def assert_counters_consistent(lot_id):
+    # Stored counters equal a recount of the spots, and the event log replays to the same numbers
+    stored = occupancy.lot_status([lot_id])[lot_id]
+    assert (stored['occupied'], stored['available_count']) == occupancy.count_spots([lot_id]).get(lot_id, (0, 0))
+    assert eventlog.replay() == []
+
+
+def test_book_and_release_keep_counters(parking, lot_id, users):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    assert occupancy.lot_status([lot_id])[lot_id]['occupied'] == 1
+    assert_counters_consistent(lot_id)
+
+    assert bookings.release(booking)
+    assert bookings.release(booking) is None
+    assert occupancy.lot_status([lot_id])[lot_id]['occupied'] == 0
+    assert_counters_consistent(lot_id)
+
+
+def test_settle_keeps_counters(parking, lot_id, users):
+    for vehicle_number in ('DL 01 AB 1', 'DL 01 AB 2', 'DL 01 AB 3'):
+        bookings.book(users['driver'], lot_id, vehicle_number)
+    assert bookings.settle([lot_id]) == 3
+    assert ReserveParkingLot.query.filter_by(is_release=False).count() == 0
+    assert occupancy.lot_status([lot_id])[lot_id]['occupied'] == 0
+    assert_counters_consistent(lot_id)
+
+
+def test_delete_spot_only_deletes_free_spots_once(parking, lot_id, users, client):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    free_spot = ParkingSpot.query.filter_by(lot_id=lot_id, occupied=False).order_by(ParkingSpot.id).first()
+    client.login(users['driver'], isadmin=True)
+
+    # Occupied spot is rejected
+    client.post(f'/delete_spot/{booking.spot_id}')
+    db.session.expire_all()
+    assert not db.session.get(ParkingSpot, booking.spot_id).deleted_spot
+
+    # Free spot is deleted once, a repeat delete changes nothing
+    for _ in range(2):
+        client.post(f'/delete_spot/{free_spot.id}')
+    db.session.expire_all()
+    assert db.session.get(ParkingSpot, free_spot.id).deleted_spot
+    assert db.session.get(ParkingLot, lot_id).number_of_spots == 4
+    assert occupancy.lot_status([lot_id])[lot_id] == {'number_of_spots': 4, 'occupied': 1, 'available_count': 3}
+    assert_counters_consistent(lot_id)
+
+    assert bookings.release(db.session.get(ReserveParkingLot, booking.id))
+    assert_counters_consistent(lot_id)
+
+
+@pytest.mark.parametrize('close', ['release', 'settle'])
+def test_booking_on_deleted_spot_is_not_counted_again(parking, lot_id, users, close):
+    booking = bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    # Spot deleted while occupied (before delete_spot checked it), its counters & events went out then
+    spot = db.session.get(ParkingSpot, booking.spot_id)
+    spot.deleted_spot = True
+    occupancy.refresh(lot_id)
+    db.session.commit()
+    eventlog.log().append([(eventlog.SPOT_DELETED, lot_id, spot.id, None, None, -1, -1)])
+
+    if close == 'release':
+        assert bookings.release(db.session.get(ReserveParkingLot, booking.id))
+    else:
+        assert bookings.settle([lot_id]) == 1
+    assert occupancy.lot_status([lot_id])[lot_id] == {'number_of_spots': 4, 'occupied': 0, 'available_count': 4}
+    assert_counters_consistent(lot_id)
+    # The deleted spot is never handed out again
+    claimed = [allocator.claim(lot_id) for _ in range(5)]
+    db.session.rollback()
+    assert spot.id not in [spot_id for spot_id, _ in filter(None, claimed)]
+
+
+def test_vehicle_already_parked(parking, lot_id, users):
+    bookings.book(users['driver'], lot_id, 'DL 01 AB 1234')
+    # Same plate written differently, by another user
+    with pytest.raises(bookings.VehicleAlreadyParked):
+        bookings.book(users['other'], lot_id, 'dl01ab-1234')
+    assert ReserveParkingLot.query.count() == 1
+    assert_counters_consistent(lot_id)
+
+
+def test_no_double_claim_under_contention(parking, lot_id, users):
+    results = []
+    errors = []
+    start = threading.Barrier(12)
+
+    def worker(n):
+        with parking.app_context():
+            try:
+                start.wait()
+                # Everybody asks for the same spot to force conflicts
+                booking = bookings.book(users['driver'], lot_id, f'DL 01 CC {n:04d}', spot_number='P001')
+                results.append(booking.spot_id if booking else None)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    booked = [spot_id for spot_id in results if spot_id is not None]
+    # Every spot is taken exactly once, the rest found the lot full
+    assert len(booked) == 5 and len(set(booked)) == 5
+    assert results.count(None) == 7
+    assert db.session.query(ReserveParkingLot.spot_id).filter_by(is_release=False)\
+        .group_by(ReserveParkingLot.spot_id).having(func.count() > 1).count() == 0
+    assert_counters_consistent(lot_id)
+
+
+@pytest.mark.parametrize('minutes, hours', [(1, 1), (60, 1), (61, 2), (180, 3)])
+def test_every_started_hour_is_billed(minutes, hours):
+    in_time = datetime(2024, 1, 1, 10, 0)
+    assert billing.charge(in_time, in_time + timedelta(minutes=minutes), 20.0) == (hours, 20.0 * hours)
+    assert billing.charges([minutes * 60], [20.0]) == ([hours], [20.0 * hours])
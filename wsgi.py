@@ -0,0 +1,6 @@
+# Production entry point for a WSGI server, e.g.
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# Run `flask --app app init-db` once before starting the workers.
+from app import create_app
+
+app = create_app()